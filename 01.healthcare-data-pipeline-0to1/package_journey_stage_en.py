@@ -0,0 +1,138 @@
+"""
+Package Classification & Patient Journey Stage
+Columnar replacement for the row-wise categorize_package / create_patient_journey_index
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+POLICY_CHANGE_DATE = pd.Timestamp('2022-12-13')
+TARGET_NAMES = ('target_medication', 'target medication')
+CONTINUOUS_PREFIXES = [f"{i}-1" for i in range(2, 10)]
+PACKAGE_TYPES = pd.CategoricalDtype(['1 month', '1.5 months', '3 months', 'Other'])
+
+def categorize_package(medicine_name, memo, consult_date):
+    """Original per-row package classification (kept as the reference implementation)"""
+    memo = str(memo).strip()
+    medicine_name = str(medicine_name).strip().lower()
+    consult_date = pd.to_datetime(consult_date)
+    
+    if not ('target_medication' in medicine_name or 'target medication' in medicine_name):
+        return 'Other'
+    
+    if memo.startswith('1-1'):
+        return '1.5 months' if consult_date <= POLICY_CHANGE_DATE else '1 month'
+    elif any(memo.startswith(f"{i}-1") for i in range(2, 10)):
+        return '3 months'
+    
+    return 'Other'
+
+def create_patient_journey_index(df):
+    """Original row-wise journey indexing (kept as the reference implementation)"""
+    df['Confirm_date'] = df.apply(
+        lambda row: max(row['PayDate'], row['ConsultTime'])
+        if pd.notna(row['PayDate']) and pd.notna(row['ConsultTime'])
+        else (row['ConsultTime'] if pd.isna(row['PayDate']) else row['PayDate']),
+        axis=1
+    )
+    
+    df['visit_index'] = (
+        df.sort_values(['Region', 'PatientID', 'Confirm_date'])
+        .groupby(['Region', 'PatientID'])
+        .cumcount() + 1
+    )
+    
+    return df
+
+def classify_packages(df):
+    """
+    Vectorized package classification.
+    
+    '1-1' memos are 1.5 months up to the 2022-12-13 policy change and 1 month
+    after it; '2-1' ~ '9-1' are 3-month packages; everything else is 'Other'.
+    """
+    medicine = df['MedicineName'].astype(str).str.strip().str.lower()
+    is_target = np.zeros(len(df), dtype=bool)
+    for name in TARGET_NAMES:
+        is_target |= medicine.str.contains(name, regex=False).fillna(False).to_numpy(dtype=bool)
+    
+    prefix = df['Memo'].astype(str).str.strip().str[:3]
+    first_package = (prefix == '1-1').fillna(False).to_numpy(dtype=bool)
+    continuous = prefix.isin(CONTINUOUS_PREFIXES).to_numpy(dtype=bool)
+    before_policy = (pd.to_datetime(df['ConsultTime']) <= POLICY_CHANGE_DATE).to_numpy(dtype=bool)
+    
+    package = np.select(
+        [is_target & first_package & before_policy,
+         is_target & first_package,
+         is_target & continuous],
+        ['1.5 months', '1 month', '3 months'],
+        default='Other'
+    )
+    df['PackageType'] = pd.Categorical(package, dtype=PACKAGE_TYPES)
+    return df
+
+def resolve_confirm_date(pay_date, consult_time):
+    """Later of PayDate and ConsultTime, falling back to whichever one is present"""
+    use_pay = pay_date.notna() & ((pay_date >= consult_time) | consult_time.isna())
+    return pay_date.where(use_pay, consult_time)
+
+def index_patient_journey(df):
+    """
+    Vectorized journey indexing: Confirm_date plus a 1-based visit_index per
+    (Region, PatientID), from a single lexsort over integer codes.
+    """
+    df['Confirm_date'] = resolve_confirm_date(df['PayDate'], df['ConsultTime'])
+    
+    region_codes, _ = pd.factorize(df['Region'])
+    patient_codes, _ = pd.factorize(df['PatientID'])
+    confirm = df['Confirm_date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    # NaT sorts last inside each patient, like sort_values(na_position='last')
+    confirm = np.where(df['Confirm_date'].isna(), np.iinfo(np.int64).max, confirm)
+    
+    order = np.lexsort((np.arange(len(df)), confirm, patient_codes, region_codes))
+    sorted_region, sorted_patient = region_codes[order], patient_codes[order]
+    
+    new_group = np.ones(len(df), dtype=bool)
+    new_group[1:] = (sorted_region[1:] != sorted_region[:-1]) | (sorted_patient[1:] != sorted_patient[:-1])
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(len(df)), 0))
+    
+    visit_index = np.empty(len(df), dtype=np.int64)
+    visit_index[order] = np.arange(len(df)) - group_start + 1
+    
+    # Rows without Region/PatientID are not indexed (groupby drops NaN keys)
+    has_key = (region_codes >= 0) & (patient_codes >= 0)
+    if has_key.all():
+        df['visit_index'] = visit_index
+    else:
+        df['visit_index'] = np.where(has_key, visit_index, np.nan)
+    
+    return df
+
+def package_journey_stage(df):
+    """Pipeline stage: package classification followed by journey indexing"""
+    return index_patient_journey(classify_packages(df))
+
+def verify_against_legacy(df):
+    """Check the stage against the row-wise implementation and compare timings"""
+    start = time.perf_counter()
+    expected = df.copy()
+    expected['PackageType'] = [
+        categorize_package(name, memo, date)
+        for name, memo, date in zip(expected['MedicineName'], expected['Memo'], expected['ConsultTime'])
+    ]
+    expected = create_patient_journey_index(expected)
+    legacy_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    actual = package_journey_stage(df.copy())
+    stage_seconds = time.perf_counter() - start
+    
+    pd.testing.assert_series_equal(
+        actual['PackageType'].astype(object), expected['PackageType'].astype(object)
+    )
+    pd.testing.assert_series_equal(actual['Confirm_date'], expected['Confirm_date'], check_dtype=False)
+    pd.testing.assert_series_equal(actual['visit_index'], expected['visit_index'])
+    
+    print(f"✅ Identical output | row-wise: {legacy_seconds:.2f}s | columnar: {stage_seconds:.3f}s")
+    return {'legacy_seconds': legacy_seconds, 'stage_seconds': stage_seconds}
@@ -0,0 +1,144 @@
+"""
+Region-Parallel Pipeline Runner
+Build the master dataset one Region partition per worker process, then merge deterministically
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows - no per-process memory limit / peak RSS
+    resource = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.excel_cache_en import read_excel_cached
+from common.schemas_en import CLINIC_RECORDS, MemoryReport, memory_mb
+from workflow_recovery_en import fast_workflow_recovery
+from note_index_en import NoteIndex
+from package_journey_stage_en import classify_packages, index_patient_journey, resolve_confirm_date
+
+def _limit_worker_memory(memory_limit_mb):
+    """Cap the address space of each worker so one oversized region cannot take the host down"""
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _peak_memory_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def _load(source):
+    if source is None or isinstance(source, pd.DataFrame):
+        return source
+    return read_excel_cached(source)
+
+def build_region(region, data, reference=None, output_dir='pipeline_parts', dedup_subset=None):
+    """
+    Run every region-local stage for one partition and write it to disk.
+    
+    Stages: missing-data recovery -> start-date standardization -> package
+    classification -> deduplication -> patient journey indexing.
+    Only a small summary is returned to the parent process.
+    """
+    start = time.perf_counter()
+    
+    # Declared dtypes: categorical Region, narrow integer ids, parsed dates
+    memory = MemoryReport()
+    df = CLINIC_RECORDS.apply(_load(data).assign(Region=region), report=memory, stage=f"{region} records")
+    reference_df = _load(reference)
+    if reference_df is None:
+        reference_df = df.copy()
+    else:
+        reference_df = CLINIC_RECORDS.apply(reference_df, report=memory, stage=f"{region} reference")
+    
+    df, report = fast_workflow_recovery(df, reference_df, verbose=False)
+    df['MedicationDate'] = resolve_confirm_date(df['PayDate'], df['ConsultTime'])
+    df = classify_packages(df)
+    df = df.drop_duplicates(subset=dedup_subset).reset_index(drop=True)
+    df = index_patient_journey(df)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    part_path = os.path.join(output_dir, f"{region}.pkl")
+    df.to_pickle(part_path)
+    
+    return {
+        'region': region,
+        'path': part_path,
+        'rows': len(df),
+        'recovery_rate': report['recovery_rate'],
+        'seconds': time.perf_counter() - start,
+        'peak_mb': _peak_memory_mb(),
+        'memory': memory.stages,
+        'output_mb': memory_mb(df)
+    }
+
+def _make_pool(max_workers, memory_limit_mb):
+    """Process pool with a fresh worker per region so memory is returned after each partition"""
+    kwargs = {
+        'max_workers': max_workers,
+        'initializer': _limit_worker_memory,
+        'initargs': (memory_limit_mb,)
+    }
+    try:
+        return ProcessPoolExecutor(max_tasks_per_child=1, **kwargs)
+    except TypeError:  # Python < 3.11
+        return ProcessPoolExecutor(**kwargs)
+
+def run_pipeline(region_sources, output_dir='pipeline_parts', max_workers=None,
+                 memory_limit_mb=None, dedup_subset=None):
+    """
+    Build the master dataset from per-region sources.
+    
+    region_sources: {region: {'data': path_or_df, 'reference': path_or_df (optional)}}
+    Partitions are processed concurrently and merged in sorted region order,
+    so the result does not depend on which worker finishes first. The merged
+    frame is saved to output_dir/master.pkl and the keyword index over its notes
+    to output_dir/note_index.npz (row ids = master.pkl positions).
+    dedup_subset: columns that identify a duplicate row. Each partition is
+    deduplicated on its own, so the subset must include Region (the default,
+    all columns, does); rows repeated across regions are kept apart.
+    """
+    if dedup_subset is not None and 'Region' not in dedup_subset:
+        raise ValueError("dedup_subset must include 'Region': partitions are deduplicated per region")
+    print(f"🔄 Pipeline started: {len(region_sources)} regions")
+    start = time.perf_counter()
+    
+    summaries = {}
+    with _make_pool(max_workers, memory_limit_mb) as pool:
+        futures = {
+            pool.submit(
+                build_region, region, source['data'], source.get('reference'),
+                output_dir, dedup_subset
+            ): region
+            for region, source in region_sources.items()
+        }
+        for future in as_completed(futures):
+            region = futures[future]
+            summary = future.result()
+            summaries[region] = summary
+            peak = f", peak {summary['peak_mb']:.0f}MB" if summary['peak_mb'] else ""
+            loaded = summary['memory'][0]
+            print(f"✅ {region}: {summary['rows']:,} rows, recovery {summary['recovery_rate']:.1f}% "
+                  f"({summary['seconds']:.1f}s{peak}, {loaded['before_mb']:.0f}MB → {loaded['after_mb']:.0f}MB on load)")
+    
+    # Deterministic merge: fixed region order, fresh index
+    parts = [pd.read_pickle(summaries[region]['path']) for region in sorted(summaries)]
+    master_df = pd.concat(parts, ignore_index=True)
+    # Each part has its own Region categories, so concat falls back to object; re-apply the schema
+    master_df = CLINIC_RECORDS.apply(master_df, validate=False)
+    
+    master_path = os.path.join(output_dir, 'master.pkl')
+    master_df.to_pickle(master_path + '.tmp')
+    os.replace(master_path + '.tmp', master_path)
+    index_path = NoteIndex.build(master_df).save(os.path.join(output_dir, 'note_index.npz'))
+    print(f"📋 Master dataset: {master_path} | note index: {index_path}")
+    print(f"✅ Pipeline completed: {len(master_df):,} records ({memory_mb(master_df):.0f}MB) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return master_df
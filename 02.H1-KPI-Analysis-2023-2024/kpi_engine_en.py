@@ -0,0 +1,127 @@
+"""
+Single-Pass KPI Engine
+Load the visit data once and derive every 2023 vs 2024 KPI table from shared keys
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.excel_cache_en import read_excel_cached
+from common.schemas_en import RETENTION, SALES, VISITS, MemoryReport
+
+AGE_BINS = [20, 30, 40, 50, 60]
+AGE_LABELS = ['20s', '30s', '40s', '50s']
+
+def assign_age_group(age):
+    """Vectorized age group classification (20s/30s/40s/50s, everything else 'Others')"""
+    age_group = pd.cut(age, bins=AGE_BINS, labels=AGE_LABELS, right=False)
+    return age_group.cat.add_categories('Others').fillna('Others')
+
+class KPIEngine:
+    """Compute all H1 KPI tables from one load and one date parse"""
+    
+    def __init__(self, visit_data, sales_data=None, retention_data=None):
+        # Accept file paths or already-loaded frames; declared dtypes are applied on load
+        self.memory = MemoryReport()
+        self.visits = self._prepare_visits(self._load(visit_data), self.memory)
+        self.sales = self._prepare_sales(self._load(sales_data), self.memory)
+        retention_data = self._load(retention_data)
+        self.retention_data = None if retention_data is None else RETENTION.apply(retention_data, report=self.memory)
+    
+    @staticmethod
+    def _load(data):
+        if data is None or isinstance(data, pd.DataFrame):
+            return data
+        return read_excel_cached(data)
+    
+    @staticmethod
+    def _prepare_visits(df, report=None):
+        """Parse Consulttime once and add the derived grouping keys"""
+        if df is None:
+            return None
+        
+        df = VISITS.apply(df, report=report)
+        consult = df['Consulttime'].astype(str)
+        df['Year'] = pd.to_datetime(consult.str[:8], format='%Y%m%d').dt.year.astype(np.int16)
+        df['Month'] = consult.str[4:6].astype('category')
+        df['AgeGroup'] = assign_age_group(df['Age'])
+        return df
+    
+    @staticmethod
+    def _prepare_sales(df, report=None):
+        if df is None:
+            return None
+        
+        df = SALES.apply(df, report=report)
+        df['PayDate'] = pd.to_datetime(df['PayDate'], format='%Y%m%d')
+        df['Year'] = df['PayDate'].dt.year
+        return df
+    
+    def segment(self, **filters):
+        """
+        Engine restricted to a segment (e.g. segment(Region='A', Month='03')).
+        Derived columns are reused, so re-running per region/month never re-parses.
+        """
+        engine = KPIEngine.__new__(KPIEngine)
+        engine.visits = self._filter(self.visits, filters)
+        engine.sales = self._filter(self.sales, filters)
+        engine.retention_data = self.retention_data
+        engine.memory = self.memory
+        return engine
+    
+    @staticmethod
+    def _filter(df, filters):
+        if df is None:
+            return None
+        
+        mask = np.ones(len(df), dtype=bool)
+        for column, value in filters.items():
+            if column not in df.columns:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= df[column].isin(values).to_numpy()
+        return df[mask]
+    
+    def patient_flow(self):
+        """Monthly unique patient count by year (same shape as analyze_patient_flow)"""
+        monthly_patients = self.visits.groupby(['Year', 'Month'], observed=True)['patientchartno'].nunique()
+        return monthly_patients.rename_axis(['Year', 'Consulttime'])
+    
+    def demographics(self):
+        """Age group / gender distribution by year (same shape as analyze_demographics)"""
+        df_unique = self.visits.drop_duplicates(subset='patientchartno')
+        
+        age_dist = (
+            df_unique.groupby(['Year', 'AgeGroup'], observed=True).size()
+            .unstack(fill_value=0)
+        )
+        age_dist.columns = age_dist.columns.astype(str)
+        age_dist.columns.name = 'AgeGroup'
+        gender_dist = df_unique.groupby(['Year', 'patientSex'], observed=True).size().unstack(fill_value=0)
+        gender_dist.columns = gender_dist.columns.astype(str)
+        gender_dist.columns.name = 'patientSex'
+        
+        return age_dist, gender_dist
+    
+    def sales_performance(self):
+        """Yearly sales sum/mean/count (same shape as analyze_sales_performance)"""
+        return self.sales.groupby('Year')['paymentamt'].agg(['sum', 'mean', 'count'])
+    
+    def retention(self):
+        """Mean retention percentage by year (same shape as analyze_retention)"""
+        return self.retention_data.groupby('Year')['percentage'].mean()
+    
+    def run(self):
+        """Every KPI table available from the loaded inputs"""
+        results = {}
+        if self.visits is not None:
+            results['patient_flow'] = self.patient_flow()
+            results['demographics'] = self.demographics()
+        if self.sales is not None:
+            results['sales_performance'] = self.sales_performance()
+        if self.retention_data is not None:
+            results['retention'] = self.retention()
+        return results
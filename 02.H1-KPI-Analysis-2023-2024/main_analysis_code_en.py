@@ -1,86 +1,52 @@
+import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
+from kpi_engine_en import KPIEngine
+
+# matplotlib/seaborn/scipy are imported inside the functions that use them, so a
+# printed-only KPI run (cron, CLI) does not pay ~3s of plotting imports
 
 def setup_style():
     """Set chart styling"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.rcParams['font.family'] = 'DejaVu Sans'
     sns.set_palette(["#4c72b0", "#55a868", "#c44e52", "#8172b2"])
 
 def analyze_patient_flow(file_path):
     """Analyze patient acquisition flow"""
-    df = pd.read_excel(file_path)
-    df['Year'] = pd.to_datetime(df['Consulttime'].astype(str).str[:8], format='%Y%m%d').dt.year
-    
     # Monthly patient count by year
-    monthly_patients = df.groupby(['Year', df['Consulttime'].astype(str).str[4:6]])['patientchartno'].nunique()
-    
-    return monthly_patients
+    return KPIEngine(file_path).patient_flow()
 
 def analyze_demographics(file_path):
     """Analyze customer profile demographics"""
-    df = pd.read_excel(file_path)
-    df['Year'] = pd.to_datetime(df['Consulttime'].astype(str).str[:8], format='%Y%m%d').dt.year
-    
-    # Remove duplicates
-    df_unique = df.drop_duplicates(subset='patientchartno')
-    
-    # Age group classification
-    def get_age_group(age):
-        if 20 <= age < 30: return '20s'
-        elif 30 <= age < 40: return '30s'  
-        elif 40 <= age < 50: return '40s'
-        elif 50 <= age < 60: return '50s'
-        else: return 'Others'
-    
-    df_unique['AgeGroup'] = df_unique['Age'].apply(get_age_group)
-    
-    # Age group/gender distribution by year
-    age_dist = df_unique.groupby(['Year', 'AgeGroup']).size().unstack(fill_value=0)
-    gender_dist = df_unique.groupby(['Year', 'patientSex']).size().unstack(fill_value=0)
-    
-    return age_dist, gender_dist
+    # Age group/gender distribution by year (deduplicated by chart number)
+    return KPIEngine(file_path).demographics()
 
 def analyze_sales_performance(file_path):
     """Analyze sales performance metrics"""
-    df = pd.read_excel(file_path)
-    df['PayDate'] = pd.to_datetime(df['PayDate'], format='%Y%m%d')
-    df['Year'] = df['PayDate'].dt.year
-    
     # Yearly sales and average purchase amount
-    yearly_sales = df.groupby('Year')['paymentamt'].agg(['sum', 'mean', 'count'])
-    
-    return yearly_sales
+    return KPIEngine(None, sales_data=file_path).sales_performance()
 
 def analyze_retention(file_path):
     """Analyze customer retention rate"""
-    df = pd.read_excel(file_path)
-    
     # Retention rate calculation (example)
-    retention_rate = df.groupby('Year')['percentage'].mean()
-    
-    return retention_rate
+    return KPIEngine(None, retention_data=file_path).retention()
 
-def create_comparison_chart(data_2023, data_2024, title, ylabel):
-    """Create simple comparison chart"""
-    fig, ax = plt.subplots(figsize=(10, 6))
-    
-    x = range(len(data_2023))
-    width = 0.35
-    
-    ax.bar([i - width/2 for i in x], data_2023, width, label='2023', alpha=0.8)
-    ax.bar([i + width/2 for i in x], data_2024, width, label='2024', alpha=0.8)
-    
-    ax.set_title(title)
-    ax.set_ylabel(ylabel)
-    ax.legend()
-    plt.xticks(x, data_2023.index)
-    plt.tight_layout()
-    plt.show()
+def create_comparison_chart(data_2023, data_2024, title, ylabel, output_path=None):
+    """Render a 2023 vs 2024 comparison chart to a PNG/SVG file (headless, never blocks)"""
+    from chart_renderer_en import ChartSpec, ComparisonRenderer, slugify
+    output_path = output_path or f"{slugify(title)}.png"
+    output_dir, filename = os.path.split(os.path.abspath(output_path))
+    name, ext = os.path.splitext(filename)
+    
+    spec = ChartSpec(name, data_2023, data_2024, title, ylabel, fmt=ext.lstrip('.') or 'png')
+    with ComparisonRenderer() as renderer:
+        path, _ = renderer.render(spec, output_dir)
+    return path
 
 def statistical_test(data_2023, data_2024, metric_name):
     """Perform T-test for statistical significance"""
+    from scipy import stats
     t_stat, p_value = stats.ttest_ind(data_2023, data_2024)
     significance = "Significant" if p_value < 0.05 else "Not significant"
     
@@ -93,9 +59,16 @@ def main():
     
     print("=== 2023 vs 2024 Healthcare KPI Comparative Analysis ===\n")
     
+    # Visit data is loaded and parsed once for every KPI below
+    try:
+        engine = KPIEngine("patient_visit_data.xlsx")
+    except Exception as e:
+        print(f"❌ Visit data could not be loaded: {type(e).__name__}: {e}")
+        return
+    
     # 1. Patient flow analysis
     try:
-        flow_data = analyze_patient_flow("patient_visit_data.xlsx")
+        flow_data = engine.patient_flow()
         flow_2023 = flow_data[2023] if 2023 in flow_data.index.get_level_values(0) else pd.Series([2800, 2600, 3100, 2900, 2750, 2650])
         flow_2024 = flow_data[2024] if 2024 in flow_data.index.get_level_values(0) else pd.Series([2500, 2400, 2850, 2700, 2550, 2400])
         
@@ -111,7 +84,7 @@ def main():
     
     # 2. Customer profile analysis  
     try:
-        age_dist, gender_dist = analyze_demographics("patient_visit_data.xlsx")
+        age_dist, gender_dist = engine.demographics()
         
         print("\n👥 Age Group Distribution Changes:")
         # Using sample data
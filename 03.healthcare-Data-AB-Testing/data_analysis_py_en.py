@@ -4,22 +4,37 @@ Purpose: Measure the effect of 1.5-month split prescription on patient care
 KPIs: BMI reduction, repurchase rate, referral rate
 """
 
+import os
+import sys
 import pandas as pd
 import numpy as np
-from statsmodels.formula.api import mixedlm
-from statsmodels.stats.proportion import proportions_ztest
-from scipy import stats
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import schemas_en
+from common.excel_cache_en import read_excel_cached
+from common.schemas_en import BMI_VISITS, INCENTIVES, PURCHASES, MemoryReport
+from common.sorted_search_en import interval_join_count
+from mixed_model_en import FitCache, RandomInterceptModel, fit_random_intercept
+from outlier_sketch_en import OutlierFilter, RunningMoments, TDigest
+from repurchase_engine_en import RepurchaseEngine
+from stage_cache_en import StageRunner
+from statistical_tests_py_en import proportion_test_from_counts
 
 class HealthcareAnalyzer:
     """Healthcare product split prescription effectiveness analyzer"""
     
-    def __init__(self):
+    def __init__(self, engine='statsmodels', outlier_mode='exact', outlier_by=None):
         self.results = {}
+        self.engine = engine  # 'fast': sufficient-statistics random-intercept fit with caching
+        self.outlier_mode = outlier_mode  # 'sketch': BMI outlier cutoffs from t-digests instead of exact quartiles
+        self.outlier_by = outlier_by  # e.g. 'group' for per-group IQR cutoffs (default: one global cutoff)
+        self.fit_cache = FitCache()
+        self.memory = MemoryReport()  # Footprint of each loaded dataset before/after its schema
     
     def preprocess_bmi_data(self, df, group_name):
         """Preprocess BMI data"""
-        # Date and BMI calculation
-        df['visit_date'] = pd.to_datetime(df['visit_date'])
+        # Declared dtypes (parsed dates, integer ids, categorical group), then BMI calculation
+        df = BMI_VISITS.apply(df.assign(group=group_name), report=self.memory, stage=f'bmi_{group_name}')
         df['height_m'] = df['height'] / 100
         df['initial_bmi'] = df['initial_weight'] / (df['height_m'] ** 2)
         df['current_bmi'] = df['current_weight'] / (df['height_m'] ** 2)
@@ -36,31 +51,36 @@ class HealthcareAnalyzer:
             (df['initial_bmi'].between(25, 30))
         ].copy()
         
-        df_filtered['group'] = group_name
         return df_filtered
     
     def analyze_bmi_effect(self, control_path, treatment_path):
         """BMI reduction effect analysis - Mixed Effects Model"""
         
         # Load and preprocess data
-        control_df = self.preprocess_bmi_data(pd.read_excel(control_path), 'control')
-        treatment_df = self.preprocess_bmi_data(pd.read_excel(treatment_path), 'treatment')
+        control_df = self.preprocess_bmi_data(read_excel_cached(control_path), 'control')
+        treatment_df = self.preprocess_bmi_data(read_excel_cached(treatment_path), 'treatment')
         combined_df = pd.concat([control_df, treatment_df])
         
-        # Remove outliers
-        Q1, Q3 = combined_df['bmi_reduction'].quantile([0.25, 0.75])
-        IQR = Q3 - Q1
-        combined_df = combined_df[
-            combined_df['bmi_reduction'].between(Q1 - 1.5*IQR, Q3 + 1.5*IQR)
-        ]
+        # Remove outliers (IQR, 1.5x); both groups fold into the same cutoff state
+        outliers = OutlierFilter('bmi_reduction', by=self.outlier_by, mode=self.outlier_mode)
+        for df in (control_df, treatment_df):
+            outliers.update(df)
+        combined_df = outliers.apply(combined_df)
         
         # Mixed-Effects Model
-        model = mixedlm(
-            'bmi_reduction ~ C(group) * days_since_start', 
-            combined_df, 
-            groups=combined_df['patient_id']
-        )
-        results = model.fit()
+        if self.engine == 'fast':
+            results = fit_random_intercept(
+                combined_df, 'bmi_reduction', 'group', 'days_since_start', 'patient_id',
+                cache=self.fit_cache
+            )
+        else:
+            from statsmodels.formula.api import mixedlm  # Heavy import, only needed on this engine
+            model = mixedlm(
+                'bmi_reduction ~ C(group) * days_since_start', 
+                combined_df, 
+                groups=combined_df['patient_id']
+            )
+            results = model.fit()
         
         # Store results
         group_effect = results.params['C(group)[T.treatment]']
@@ -76,52 +96,52 @@ class HealthcareAnalyzer:
         
         return results
     
-    def analyze_repurchase_rate(self, purchase_data_paths):
-        """Repurchase rate analysis - Z-test"""
-        
-        results = []
+    def analyze_repurchase_rate(self, purchase_data_paths, windows=None, window=150):
+        """
+        Repurchase rate analysis - Z-test.
+        First and second purchase files are stacked into one purchase table so every
+        window in `windows` is answered from the same next-purchase gaps.
+        """
         
+        purchases = []
         for paths in purchase_data_paths:
-            first_df = pd.read_excel(paths['first'])
-            second_df = pd.read_excel(paths['second'])
-            
-            # Merge repurchase data
-            merged_df = pd.merge(first_df, second_df, on='patient_id', suffixes=('_1st', '_2nd'))
-            merged_df['days_between'] = (
-                pd.to_datetime(merged_df['purchase_date_2nd']) - 
-                pd.to_datetime(merged_df['purchase_date_1st'])
-            ).dt.days
-            
-            # Repurchase within 150 days
-            repurchase_count = len(merged_df[merged_df['days_between'] <= 150])
-            total_count = len(first_df)
-            
-            results.append({
-                'group': paths['group'],
-                'total': total_count,
-                'repurchase': repurchase_count,
-                'rate': repurchase_count / total_count * 100
-            })
+            for key, is_first in (('first', True), ('second', False)):
+                df = PURCHASES.apply(read_excel_cached(paths[key])[['patient_id', 'purchase_date']],
+                                     report=self.memory, stage=f"{paths['group']}_{key}")
+                purchases.append(df.assign(group=paths['group'], is_first=is_first))
+        purchases = pd.concat(purchases, ignore_index=True)
+        purchases['group'] = purchases['group'].astype('category')
+        purchases['patient_key'] = purchases.groupby(['group', 'patient_id'], observed=True).ngroup()
+        
+        # Each first-file purchase is an index purchase; gaps run to that patient's next purchase
+        engine = RepurchaseEngine(purchases, patient_col='patient_key', index_col='is_first')
+        windows = sorted(set(windows or []) | {window})
+        rates = engine.rates(windows)
+        
+        groups = [paths['group'] for paths in purchase_data_paths]
+        selected = rates[rates['window'] == window].set_index('group').loc[groups]
+        results = [
+            {'group': group, 'total': int(row['total']), 'repurchase': int(row['repurchase']), 'rate': float(row['rate'])}
+            for group, row in selected.iterrows()
+        ]
         
         # Z-test
-        z_stat, p_value = proportions_ztest(
-            [results[0]['repurchase'], results[1]['repurchase']],
-            [results[0]['total'], results[1]['total']]
-        )
+        tests = engine.ztest(groups[:2], windows=windows).set_index('window')
         
         self.results['repurchase'] = {
             'groups': results,
-            'z_statistic': z_stat,
-            'p_value': p_value,
-            'significant': p_value < 0.05
+            'z_statistic': tests.loc[window, 'z_statistic'],
+            'p_value': tests.loc[window, 'p_value'],
+            'significant': tests.loc[window, 'p_value'] < 0.05,
+            'windows': tests.reset_index()
         }
         
         return results
     
-    def analyze_referral_rate(self, purchase_paths, incentive_path):
+    def analyze_referral_rate(self, purchase_paths, incentive_path, window_days=150):
         """Referral rate analysis"""
         
-        incentive_df = pd.read_excel(incentive_path)
+        incentive_df = INCENTIVES.apply(read_excel_cached(incentive_path), report=self.memory, stage='incentives')
         incentive_df['region'] = incentive_df['location'].map({
             'loc_a': 'A', 'loc_b': 'B', 'loc_c': 'C', 
             'loc_d': 'D', 'loc_e': 'E', 'loc_f': 'F', 'loc_g': 'G'
@@ -130,25 +150,16 @@ class HealthcareAnalyzer:
         results = []
         
         for path_info in purchase_paths:
-            purchase_df = pd.read_excel(path_info['path'])
+            purchase_df = PURCHASES.apply(read_excel_cached(path_info['path']), report=self.memory,
+                                          stage=f"referral_{path_info['group']}")
             
-            # Match purchase-incentive data
-            merged_df = pd.merge(
-                purchase_df, incentive_df,
-                on=['region', 'patient_chart_no'],
-                how='inner'
+            # Incentive usage within window_days (0 <= days_diff <= window_days), counted per purchase
+            matches = interval_join_count(
+                purchase_df, incentive_df, ['region', 'patient_chart_no'],
+                'purchase_date', 'incentive_date',
+                start=pd.Timedelta(0), end=pd.Timedelta(days=window_days + 1)
             )
-            
-            # Incentive usage within 150 days
-            merged_df['days_diff'] = (
-                pd.to_datetime(merged_df['incentive_date']) - 
-                pd.to_datetime(merged_df['purchase_date'])
-            ).dt.days
-            
-            valid_referrals = len(merged_df[
-                (merged_df['days_diff'] >= 0) & 
-                (merged_df['days_diff'] <= 150)
-            ])
+            valid_referrals = int(matches.sum())
             
             total_customers = len(purchase_df)
             
@@ -188,11 +199,29 @@ class HealthcareAnalyzer:
         
         print("\n💡 Conclusion: Quantitative measurement of enhanced patient care effects through split prescription completed")
     
-    def run_full_analysis(self):
-        """Execute full analysis"""
+    def _stage_result(self, key, analysis, *args):
+        """Run one analysis method and return the entry it stores in self.results"""
+        analysis(*args)
+        return self.results[key]
+    
+    def _report_stage(self, name, cached, seconds):
+        labels = {
+            'bmi': "1️⃣ BMI Reduction Effect Analysis",
+            'repurchase': "2️⃣ Repurchase Rate Analysis",
+            'referral': "3️⃣ Referral Rate Analysis"
+        }
+        print(f"{labels.get(name, name)}... {'✅ cached' if cached else f'✅ {seconds:.1f}s'}")
+    
+    def run_full_analysis(self, use_cache=True, max_workers=3, paths=None):
+        """
+        Execute full analysis.
+        Each stage is cached by its input files, parameters and code; only stages
+        whose inputs changed are recomputed (use_cache=False forces a full run).
+        paths overrides the sample file paths below (same keys).
+        """
         
         # Sample file paths (modify when in actual use)
-        paths = {
+        paths = paths or {
             'bmi_control': "sample_data/control_bmi.xlsx",
             'bmi_treatment': "sample_data/treatment_bmi.xlsx",
             'repurchase': [
@@ -208,20 +237,49 @@ class HealthcareAnalyzer:
         
         print("🔍 Healthcare Product Split Prescription Effectiveness Analysis Started")
         
+        runner = StageRunner(max_workers=max_workers, use_cache=use_cache)
+        # code= names one object per module the stage runs; the whole module source
+        # is hashed. Every stage loads through the Excel cache and the schemas module
+        # (BMI_VISITS / PURCHASES / INCENTIVES and their dtype conversion)
+        loader_code = [read_excel_cached, schemas_en]
+        
         # 1. BMI analysis
-        print("\n1️⃣ BMI Reduction Effect Analysis...")
-        self.analyze_bmi_effect(paths['bmi_control'], paths['bmi_treatment'])
+        runner.add(
+            'bmi', lambda: self._stage_result('bmi', self.analyze_bmi_effect, paths['bmi_control'], paths['bmi_treatment']),
+            inputs=[paths['bmi_control'], paths['bmi_treatment']],
+            params={'engine': self.engine, 'outlier_mode': self.outlier_mode, 'outlier_by': self.outlier_by},
+            code=[self.preprocess_bmi_data, self.analyze_bmi_effect, RandomInterceptModel, fit_random_intercept,
+                  OutlierFilter, TDigest, RunningMoments, *loader_code]
+        )
         
         # 2. Repurchase rate analysis
-        print("2️⃣ Repurchase Rate Analysis...")
-        self.analyze_repurchase_rate(paths['repurchase'])
+        runner.add(
+            'repurchase', lambda: self._stage_result('repurchase', self.analyze_repurchase_rate, paths['repurchase']),
+            inputs=[p[key] for p in paths['repurchase'] for key in ('first', 'second')],
+            params={'paths': paths['repurchase']},
+            code=[self.analyze_repurchase_rate, RepurchaseEngine, proportion_test_from_counts, *loader_code]
+        )
         
         # 3. Referral rate analysis
-        print("3️⃣ Referral Rate Analysis...")
-        self.analyze_referral_rate(paths['referral_purchase'], paths['referral_incentive'])
+        runner.add(
+            'referral', lambda: self._stage_result(
+                'referral', self.analyze_referral_rate, paths['referral_purchase'], paths['referral_incentive']
+            ),
+            inputs=[p['path'] for p in paths['referral_purchase']] + [paths['referral_incentive']],
+            params={'paths': paths['referral_purchase']},
+            code=[self.analyze_referral_rate, interval_join_count, *loader_code]
+        )
+        
+        # Independent stages run concurrently; unchanged stages load from .stage_cache/
+        stage_results = runner.run(on_done=self._report_stage)
+        for name in stage_results:
+            self.results.pop(name, None)  # Keep the stage declaration order
+        self.results.update(stage_results)
         
         # 4. Results summary
         self.print_summary()
+        if self.memory.stages:
+            self.memory.print()
         
         return self.results
 
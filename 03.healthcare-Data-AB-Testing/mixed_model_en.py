@@ -0,0 +1,296 @@
+"""
+Random-Intercept Mixed Model
+REML fit of outcome ~ C(group) * time + (1 | patient) from per-patient sufficient statistics
+"""
+
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import optimize, stats
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fit_cache')
+CACHE_MAX_ENTRIES = 256  # Least recently used fits are evicted beyond this
+
+def _code_version():
+    """Hash of this module's source: editing the estimator invalidates every cached fit"""
+    with open(os.path.abspath(__file__), 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+CODE_VERSION = _code_version()
+
+def design_columns(group_levels, group_var, time_var):
+    """Fixed-effect names in the same order and spelling as statsmodels/patsy"""
+    names = ['Intercept']
+    names += [f'C({group_var})[T.{level}]' for level in group_levels[1:]]
+    names.append(time_var)
+    names += [f'C({group_var})[T.{level}]:{time_var}' for level in group_levels[1:]]
+    return names
+
+def patient_stats(data, outcome, group_var, time_var, subject_id, group_levels=None):
+    """
+    Per-patient sufficient statistics of the design: X'X, X'1, X'y, 1'y, y'y and n.
+    This is everything the random-intercept likelihood needs, so the fit never
+    touches individual visit rows again.
+    """
+    frame = data[[outcome, group_var, time_var, subject_id]].dropna()
+    if group_levels is None:
+        group_levels = sorted(frame[group_var].unique())
+    
+    y = frame[outcome].to_numpy(dtype=float)
+    time = frame[time_var].to_numpy(dtype=float)
+    dummies = np.column_stack([(frame[group_var] == level).to_numpy(dtype=float) for level in group_levels[1:]]) \
+        if len(group_levels) > 1 else np.empty((len(frame), 0))
+    X = np.column_stack([np.ones(len(frame)), dummies, time, dummies * time[:, None]])
+    
+    codes, patients = pd.factorize(frame[subject_id], sort=True)
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    X, y = X[order], y[order]
+    
+    def per_patient(values):
+        return np.add.reduceat(values, starts, axis=0)
+    
+    return {
+        'names': design_columns(group_levels, group_var, time_var),
+        'group_levels': list(group_levels),
+        'patients': patients,
+        'n': per_patient(np.ones(len(y))),
+        'XtX': per_patient(X[:, :, None] * X[:, None, :]),
+        'Xt1': per_patient(X),
+        'Xty': per_patient(X * y[:, None]),
+        'ty': per_patient(y),
+        'yty': per_patient(y * y),
+    }
+
+class RandomInterceptResults:
+    """Fitted model with the statsmodels MixedLMResults attributes used in this project"""
+    
+    def __init__(self, names, beta, cov_fe, scale, gamma, group_var_bse, llf, converged, nobs, n_groups):
+        self.fe_params = pd.Series(beta, index=names)
+        self.cov_re = pd.DataFrame([[gamma * scale]], index=['Group'], columns=['Group'])
+        self.scale = scale
+        self.gamma = gamma  # random-intercept variance / residual variance
+        self.llf = llf
+        self.converged = converged
+        self.nobs = nobs
+        self.n_groups = n_groups
+        self.cov_fe = pd.DataFrame(cov_fe, index=names, columns=names)
+        
+        self.params = pd.concat([self.fe_params, pd.Series({'Group Var': gamma})])
+        self.bse = pd.concat([pd.Series(np.sqrt(np.diag(cov_fe)), index=names), pd.Series({'Group Var': group_var_bse})])
+        self.bse_fe = self.bse[names]
+        self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(2 * stats.norm.sf(np.abs(self.tvalues)), index=self.params.index)
+    
+    def summary_frame(self):
+        return pd.DataFrame({'coef': self.params, 'std_err': self.bse, 'z': self.tvalues, 'p_value': self.pvalues})
+
+class RandomInterceptModel:
+    """
+    REML random-intercept model. With V_i = scale * (I + gamma * J) the inverse and
+    determinant of each patient's covariance are closed-form, so one likelihood
+    evaluation is O(patients * p^2) regardless of how many visits each patient has.
+    """
+    
+    def __init__(self, suff):
+        self.suff = suff
+        self.names = suff['names']
+        self.nobs = int(suff['n'].sum())
+        self.n_groups = len(suff['n'])
+        self.k_fe = len(self.names)
+        self._XtX = suff['XtX'].sum(axis=0)
+        self._Xty = suff['Xty'].sum(axis=0)
+        self._yty = suff['yty'].sum()
+    
+    @classmethod
+    def from_data(cls, data, outcome, group_var, time_var, subject_id, group_levels=None):
+        return cls(patient_stats(data, outcome, group_var, time_var, subject_id, group_levels))
+    
+    def _weighted(self, gamma):
+        """X'V0^-1 X, X'V0^-1 y, y'V0^-1 y and log|V0| for the scale-free covariance V0"""
+        s = self.suff
+        w = gamma / (1 + s['n'] * gamma)
+        A = self._XtX - np.einsum('i,ij,ik->jk', w, s['Xt1'], s['Xt1'])
+        b = self._Xty - (w * s['ty']) @ s['Xt1']
+        c = self._yty - np.sum(w * s['ty'] ** 2)
+        logdet_v = np.sum(np.log1p(s['n'] * gamma))
+        return A, b, c, logdet_v
+    
+    def profile_loglike(self, gamma):
+        """REML log-likelihood with the fixed effects and scale profiled out"""
+        A, b, c, logdet_v = self._weighted(gamma)
+        beta = np.linalg.solve(A, b)
+        dof = self.nobs - self.k_fe
+        scale = (c - b @ beta) / dof
+        _, logdet_a = np.linalg.slogdet(A)
+        return -0.5 * (dof * np.log(scale) + logdet_v + logdet_a + dof * (1 + np.log(2 * np.pi)))
+    
+    def loglike(self, beta, gamma):
+        """REML log-likelihood at explicit fixed effects (scale profiled), as statsmodels evaluates it"""
+        A, b, c, logdet_v = self._weighted(gamma)
+        dof = self.nobs - self.k_fe
+        scale = (c - 2 * b @ beta + beta @ A @ beta) / dof
+        _, logdet_a = np.linalg.slogdet(A)
+        return -0.5 * (dof * np.log(scale) + logdet_v + logdet_a + dof * (1 + np.log(2 * np.pi)))
+    
+    def fit(self, start_gamma=None):
+        """Maximise the profile REML likelihood over gamma >= 0 (start_gamma warm-starts the search)"""
+        def objective(x):
+            return -self.profile_loglike(x[0])
+        
+        start = start_gamma if start_gamma is not None else 1.0
+        opt = optimize.minimize(objective, [start], method='L-BFGS-B', bounds=[(0, None)],
+                               options={'ftol': 1e-13, 'gtol': 1e-9})
+        gamma = float(opt.x[0])
+        
+        A, b, c, _ = self._weighted(gamma)
+        beta = np.linalg.solve(A, b)
+        scale = (c - b @ beta) / (self.nobs - self.k_fe)
+        cov_fe = scale * np.linalg.inv(A)
+        
+        result = RandomInterceptResults(
+            self.names, beta, cov_fe, scale, gamma, self._gamma_bse(beta, gamma),
+            -opt.fun, bool(opt.success), self.nobs, self.n_groups
+        )
+        result.iterations = opt.nit
+        return result
+    
+    def _gamma_bse(self, beta, gamma):
+        """Standard error of gamma from the numerical Hessian of the joint (beta, gamma) likelihood"""
+        if gamma <= 0:
+            return np.nan
+        
+        theta = np.append(beta, gamma)
+        steps = np.maximum(np.abs(theta), 1e-3) * 1e-4
+        k = len(theta)
+        
+        def f(values):
+            return self.loglike(values[:-1], values[-1])
+        
+        hessian = np.empty((k, k))
+        for i in range(k):
+            for j in range(i, k):
+                ei, ej = np.eye(k)[i] * steps[i], np.eye(k)[j] * steps[j]
+                hessian[i, j] = hessian[j, i] = (
+                    f(theta + ei + ej) - f(theta + ei - ej) - f(theta - ei + ej) + f(theta - ei - ej)
+                ) / (4 * steps[i] * steps[j])
+        
+        try:
+            cov = np.linalg.inv(-hessian)
+        except np.linalg.LinAlgError:
+            return np.nan
+        return float(np.sqrt(cov[-1, -1])) if cov[-1, -1] > 0 else np.nan
+
+class FitCache:
+    """
+    Pickled fit results keyed by a hash of the model columns' content and the model spec.
+    Also remembers the last gamma per spec so a re-fit after a few patients change
+    starts next to the previous optimum.
+    Stored next to this module (not the working directory), keyed on its source,
+    and trimmed to the max_entries most recently used files.
+    """
+    
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+    
+    @staticmethod
+    def spec_key(outcome, group_var, time_var, subject_id, group_levels):
+        spec = repr((CODE_VERSION, outcome, group_var, time_var, subject_id, list(group_levels)))
+        return hashlib.sha1(spec.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def data_key(spec_key, data, columns):
+        row_hashes = pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+        digest = hashlib.sha256(spec_key.encode('utf-8'))
+        digest.update(row_hashes.tobytes())
+        return digest.hexdigest()
+    
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+    
+    def get(self, name):
+        """Cached value or None; anything unreadable (truncated, renamed classes) means refit"""
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)  # Mark as recently used
+            return value
+        except Exception:
+            return None
+    
+    def put(self, name, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._path(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(name))
+        self._evict()
+    
+    def _evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.pkl')]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                os.remove(entry.path)
+        except OSError:
+            pass  # Another process evicted the same files
+
+def fit_random_intercept(data, outcome, group_var, time_var, subject_id, group_levels=None, cache=None):
+    """
+    Fit outcome ~ C(group_var) * time_var with a random intercept per subject.
+    With a FitCache, identical data returns the stored result without fitting and
+    changed data warm-starts from the previous fit of the same model.
+    """
+    columns = [outcome, group_var, time_var, subject_id]
+    if group_levels is None:
+        group_levels = sorted(data[group_var].dropna().unique())
+    
+    if cache is not None:
+        spec_key = cache.spec_key(outcome, group_var, time_var, subject_id, group_levels)
+        data_key = cache.data_key(spec_key, data, columns)
+        cached = cache.get(data_key)
+        if cached is not None:
+            return cached
+        previous = cache.get(f"last_{spec_key}")
+        start_gamma = previous.gamma if previous is not None else None
+    else:
+        start_gamma = None
+    
+    model = RandomInterceptModel.from_data(data, outcome, group_var, time_var, subject_id, group_levels)
+    result = model.fit(start_gamma)
+    
+    if cache is not None:
+        cache.put(data_key, result)
+        cache.put(f"last_{spec_key}", result)
+    return result
+
+def _fit_task(args):
+    data, outcome, group_var, time_var, subject_id, group_levels, cache_dir = args
+    cache = FitCache(cache_dir) if cache_dir else None
+    return fit_random_intercept(data, outcome, group_var, time_var, subject_id, group_levels, cache)
+
+def fit_many(data, outcomes, group_var, time_var, subject_id, segment_col=None, max_workers=None, cache=None):
+    """
+    Fit one model per outcome (and per segment) in parallel processes.
+    Returns {(outcome, segment): RandomInterceptResults}; segment is None without segment_col.
+    """
+    group_levels = sorted(data[group_var].dropna().unique())
+    segments = [(None, data)] if segment_col is None else list(data.groupby(segment_col, observed=True, sort=True))
+    cache_dir = cache.cache_dir if cache is not None else None
+    
+    keys, tasks = [], []
+    for segment, frame in segments:
+        for outcome in outcomes:
+            keys.append((outcome, segment))
+            tasks.append((frame[[outcome, group_var, time_var, subject_id]], outcome, group_var, time_var,
+                          subject_id, group_levels, cache_dir))
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(keys, pool.map(_fit_task, tasks)))
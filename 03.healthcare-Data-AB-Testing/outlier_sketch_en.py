@@ -0,0 +1,241 @@
+"""
+Outlier Sketches
+Per-group IQR / z-score outlier filtering from mergeable quantile sketches and running moments
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_COMPRESSION = 1000  # t-digest delta: ~delta/2 centroids per group, rank error bound below
+
+def rank_error_bound(q, compression=DEFAULT_COMPRESSION):
+    """
+    Worst-case rank error of a t-digest quantile estimate (as a fraction of n).
+    
+    With the k1 scale function a centroid spans at most one unit of
+    k(q) = delta / (2*pi) * asin(2q - 1), i.e. 2*pi*sqrt(q(1-q)) / delta of the ranks
+    around q; the estimate interpolates inside that centroid. For the quartiles at
+    delta=1000 this is 0.27% of the rows (measured errors are far smaller).
+    """
+    q = np.asarray(q, dtype=float)
+    return 2 * np.pi * np.sqrt(q * (1 - q)) / compression
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations, merged with Chan's parallel update"""
+    
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n, self.mean, self.m2 = n, mean, m2
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            mean = values.mean()
+            self.merge(RunningMoments(len(values), mean, ((values - mean) ** 2).sum()))
+        return self
+    
+    def merge(self, other):
+        n = self.n + other.n
+        if n:
+            delta = other.mean - self.mean
+            self.mean += delta * other.n / n
+            self.m2 += other.m2 + delta ** 2 * self.n * other.n / n
+            self.n = n
+        return self
+    
+    def std(self, ddof=0):
+        """Population std by default (same as scipy.stats.zscore)"""
+        return np.sqrt(self.m2 / (self.n - ddof)) if self.n > ddof else np.nan
+
+class TDigest:
+    """
+    Merging t-digest: weighted centroids sorted by mean, re-clustered so each
+    centroid covers at most one unit of the k1 scale function (small clusters in
+    the tails, larger ones near the median). update() and merge() both re-cluster
+    the union of centroids in one vectorized pass, so digests built on separate
+    chunks or partitions combine into one.
+    """
+    
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = np.inf, -np.inf
+    
+    @property
+    def count(self):
+        return self.weights.sum()
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+            self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+    
+    def merge(self, other):
+        if len(other.means):
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+    
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        
+        # Centroids whose mid-rank falls in the same unit of k(q) are merged
+        q = (np.cumsum(weights) - weights / 2) / weights.sum()
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+    
+    def quantile(self, q):
+        """
+        Estimated quantiles on pandas' 'linear' convention (position q * (n - 1)),
+        interpolating between centroid centers; exact while every centroid is a single value.
+        """
+        q = np.asarray(q, dtype=float)
+        if not len(self.means):
+            return np.full(q.shape, np.nan)
+        
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xp = np.r_[0.5, centers, self.count - 0.5]
+        fp = np.r_[self.min, self.means, self.max]
+        return np.interp(q * (self.count - 1) + 0.5, xp, fp)
+
+class _ExactSample:
+    """Exact-mode group state: keeps the values (fine for data that fits in memory)"""
+    
+    def __init__(self):
+        self.parts = []
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self.parts.append(values[~np.isnan(values)])
+        return self
+    
+    def merge(self, other):
+        self.parts.extend(other.parts)
+        return self
+    
+    def summary(self, quantiles):
+        values = np.concatenate(self.parts) if self.parts else np.empty(0)
+        if len(self.parts) > 1:
+            self.parts = [values]
+        if not len(values):
+            return 0, np.full(len(quantiles), np.nan), np.nan, np.nan
+        return len(values), np.quantile(values, quantiles), values.mean(), values.std()
+
+class _SketchSample:
+    """Sketch-mode group state: t-digest for quantiles plus running moments for z-scores"""
+    
+    def __init__(self, compression):
+        self.digest = TDigest(compression)
+        self.moments = RunningMoments()
+    
+    def update(self, values):
+        self.digest.update(values)
+        self.moments.update(values)
+        return self
+    
+    def merge(self, other):
+        self.digest.merge(other.digest)
+        self.moments.merge(other.moments)
+        return self
+    
+    def summary(self, quantiles):
+        return self.moments.n, self.digest.quantile(quantiles), self.moments.mean, self.moments.std()
+
+class OutlierFilter:
+    """
+    IQR or z-score outlier filter with one cutoff per group.
+    
+    update() folds in a frame or chunk (single pass, any number of chunks);
+    filters built on separate partitions combine with merge(). Then mask()/apply()
+    drop the outliers of any chunk using its group's cutoffs:
+      iqr:    keep Q1 - k*IQR <= x <= Q3 + k*IQR
+      zscore: keep |x - mean| / std < k   (population std, NaN ignored)
+    mode='exact' keeps the values and matches the single-frame computation;
+    mode='sketch' keeps a t-digest (quartiles within rank_error_bound) and exact
+    running moments per group, so memory does not grow with the data.
+    NaN values and rows of groups never seen by update() are dropped.
+    """
+    
+    QUANTILES = [0.25, 0.75]
+    
+    def __init__(self, column, by=None, method='iqr', multiplier=1.5, mode='exact',
+                 compression=DEFAULT_COMPRESSION):
+        if method not in ('iqr', 'zscore'):
+            raise ValueError(f"Unknown outlier method: {method}")
+        if mode not in ('exact', 'sketch'):
+            raise ValueError(f"Unknown outlier mode: {mode}")
+        self.column = column
+        self.by = [by] if isinstance(by, str) else list(by or [])
+        self.method = method
+        self.multiplier = multiplier
+        self.mode = mode
+        self.compression = compression
+        self.groups = {}
+    
+    def _state(self):
+        return _ExactSample() if self.mode == 'exact' else _SketchSample(self.compression)
+    
+    def update(self, chunk):
+        if not self.by:
+            self.groups.setdefault((), self._state()).update(chunk[self.column])
+            return self
+        
+        for key, values in chunk.groupby(self.by, observed=True, sort=False)[self.column]:
+            self.groups.setdefault(key, self._state()).update(values)
+        return self
+    
+    def merge(self, other):
+        for key, state in other.groups.items():
+            self.groups.setdefault(key, self._state()).merge(state)
+        return self
+    
+    @classmethod
+    def from_chunks(cls, chunks, column, **options):
+        """Cutoffs from an iterable of chunks (e.g. pd.read_csv(..., chunksize=...)) in one pass"""
+        outliers = cls(column, **options)
+        for chunk in chunks:
+            outliers.update(chunk)
+        return outliers
+    
+    def bounds(self):
+        """Per-group n, quartiles, mean, std and the lower/upper cutoffs"""
+        rows = []
+        for key, state in self.groups.items():
+            n, (q1, q3), mean, std = state.summary(self.QUANTILES)
+            if self.method == 'iqr':
+                spread = self.multiplier * (q3 - q1)
+                lower, upper = q1 - spread, q3 + spread
+            else:
+                lower, upper = mean - self.multiplier * std, mean + self.multiplier * std
+            rows.append((*key, n, q1, q3, mean, std, lower, upper))
+        
+        bounds = pd.DataFrame(rows, columns=self.by + ['n', 'q1', 'q3', 'mean', 'std', 'lower', 'upper'])
+        if self.mode == 'sketch' and self.method == 'iqr':
+            bounds['rank_error'] = rank_error_bound(self.QUANTILES[0], self.compression)
+        return bounds.set_index(self.by).sort_index() if self.by else bounds
+    
+    def mask(self, chunk):
+        """True for the rows of chunk that are not outliers"""
+        bounds = self.bounds()
+        if self.by:
+            keys = pd.MultiIndex.from_frame(chunk[self.by]) if len(self.by) > 1 else pd.Index(chunk[self.by[0]])
+            per_row = bounds.reindex(keys)
+        else:
+            per_row = bounds.iloc[np.zeros(len(chunk), dtype=int)] if len(bounds) else bounds.reindex(range(len(chunk)))
+        
+        values = chunk[self.column].to_numpy(dtype=float)
+        if self.method == 'iqr':
+            return (values >= per_row['lower'].to_numpy()) & (values <= per_row['upper'].to_numpy())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.abs((values - per_row['mean'].to_numpy()) / per_row['std'].to_numpy())
+        return z_scores < self.multiplier
+    
+    def apply(self, chunk):
+        return chunk[self.mask(chunk)]
@@ -0,0 +1,104 @@
+"""
+Repurchase Engine
+Next-purchase gaps computed once, then repurchase rates for any windows x cohorts from a gap CDF
+"""
+
+import numpy as np
+import pandas as pd
+from statistical_tests_py_en import proportion_test_from_counts
+
+DEFAULT_WINDOWS = [25, 60, 120, 150, 200]
+NS_PER_DAY = 86_400 * 10**9
+
+class RepurchaseEngine:
+    """
+    Works on one purchase table (one row per purchase).
+    
+    Each index purchase (by default a patient's first purchase) gets the gap in
+    days to the same patient's next purchase. Gaps are binned per cohort into a
+    histogram whose cumulative sum answers "repurchased within w days" for every
+    window at once. Purchases without a date count as index purchases that were
+    never repurchased, and are never counted as a repurchase.
+    """
+    
+    def __init__(self, purchases, patient_col='patient_id', date_col='purchase_date',
+                 cohort_cols=('group',), index_col=None, max_window=365):
+        self.cohort_cols = list(cohort_cols)
+        
+        # Sort once by patient and date, then compute every gap in one vectorized pass
+        frame = purchases[[patient_col, date_col] + self.cohort_cols + ([index_col] if index_col else [])].copy()
+        frame[date_col] = pd.to_datetime(frame[date_col])
+        frame = frame.sort_values([patient_col, date_col], kind='stable').reset_index(drop=True)
+        
+        patients = frame[patient_col].to_numpy()
+        dates = frame[date_col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        # NaT dates (sorted last per patient) would view as INT64_MIN: a missing
+        # date is never a repurchase and never the start of one
+        dated = frame[date_col].notna().to_numpy()
+        has_next = np.r_[(patients[1:] == patients[:-1]) & dated[1:] & dated[:-1], False]
+        gaps = np.full(len(frame), -1, dtype=np.int64)  # -1 = never repurchased
+        gaps[has_next] = (dates[1:] - dates[:-1])[has_next[:-1]] // NS_PER_DAY
+        
+        if index_col:
+            is_index = frame[index_col].to_numpy(dtype=bool)
+        else:
+            is_index = np.r_[True, patients[1:] != patients[:-1]]
+        
+        index_rows = frame.loc[is_index, self.cohort_cols]
+        self.gaps = gaps[is_index]
+        if self.cohort_cols:
+            grouped = index_rows.groupby(self.cohort_cols, sort=True, dropna=False, observed=True)
+            self._codes = grouped.ngroup().to_numpy()
+            self.cohorts = grouped.size().index.to_frame(index=False)
+        else:
+            self._codes = np.zeros(len(self.gaps), dtype=np.int64)
+            self.cohorts = pd.DataFrame(index=[0])
+        self._build_histogram(max_window)
+    
+    def _build_histogram(self, max_window):
+        """Histogram [cohort, gap day]; last column collects gaps beyond max_window and no repurchase"""
+        self.max_window = max_window
+        n_bins = max_window + 2
+        bins = np.where((self.gaps >= 0) & (self.gaps <= max_window), self.gaps, max_window + 1)
+        counts = np.bincount(self._codes * n_bins + bins, minlength=len(self.cohorts) * n_bins)
+        self.histogram = counts.reshape(len(self.cohorts), n_bins)
+        self.cumulative = np.cumsum(self.histogram[:, :-1], axis=1)
+        self.totals = self.histogram.sum(axis=1)
+    
+    def rates(self, windows=DEFAULT_WINDOWS):
+        """Tidy frame: cohort columns, window, total, repurchase, rate (%)"""
+        windows = np.asarray(windows, dtype=np.int64)
+        if windows.max() > self.max_window:
+            self._build_histogram(int(windows.max()))
+        
+        repurchase = self.cumulative[:, windows]  # [cohort, window]
+        n_cohorts, n_windows = repurchase.shape
+        result = self.cohorts.loc[np.repeat(np.arange(n_cohorts), n_windows)].reset_index(drop=True)
+        result['window'] = np.tile(windows, n_cohorts)
+        result['total'] = np.repeat(self.totals, n_windows)
+        result['repurchase'] = repurchase.ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['rate'] = result['repurchase'] / result['total'] * 100
+        return result
+    
+    def ztest(self, groups, group_col='group', windows=DEFAULT_WINDOWS, by=None):
+        """
+        Two-proportion z-tests of groups[0] vs groups[1] for every window
+        (and every combination of the `by` cohort columns) in one vectorized call.
+        """
+        by = list(by or [])
+        rates = self.rates(windows)
+        keys = by + ['window']
+        first = rates[rates[group_col] == groups[0]].set_index(keys)
+        second = rates[rates[group_col] == groups[1]].set_index(keys)
+        first, second = first.align(second, join='outer')
+        
+        result = pd.DataFrame({
+            'total1': first['total'], 'repurchase1': first['repurchase'],
+            'total2': second['total'], 'repurchase2': second['repurchase']
+        })
+        result = result.assign(**proportion_test_from_counts(
+            result['repurchase1'], result['total1'], result['repurchase2'], result['total2']
+        ))
+        result['significant'] = result['p_value'] < 0.05
+        return result.reset_index()
@@ -0,0 +1,183 @@
+"""
+Resampling Engine
+Bootstrap confidence intervals and permutation p-values for two-group effect sizes on all cores
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_BLOCK_SIZE = 500              # Resamples per task (one seed per block)
+DEFAULT_MAX_ELEMENTS = 8_000_000      # Index-matrix cells held in memory at once per worker
+
+_WORKER_UNITS = None
+
+def unit_stats(values, clusters=None):
+    """
+    Per-unit sufficient statistics (count, sum, sum of squares).
+    Without clusters every observation is a unit; with clusters (e.g. patient_id)
+    each patient is one unit so resampling keeps a patient's visits together.
+    """
+    values = np.asarray(values, dtype=float)
+    keep = ~np.isnan(values)
+    values = values[keep]
+    
+    if clusters is None:
+        return np.ones_like(values), values, values ** 2
+    
+    _, codes = np.unique(np.asarray(clusters)[keep], return_inverse=True)
+    count = np.bincount(codes).astype(float)
+    total = np.bincount(codes, weights=values)
+    squares = np.bincount(codes, weights=values ** 2)
+    return count, total, squares
+
+def _statistic(name, n1, s1, ss1, n2, s2, ss2):
+    """Effect size from group totals (works on scalars and on arrays of resamples)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean1, mean2 = s1 / n1, s2 / n2
+        if name == 'mean_diff':
+            return mean1 - mean2
+        
+        var1 = (ss1 - s1 * mean1) / (n1 - 1)
+        var2 = (ss2 - s2 * mean2) / (n2 - 1)
+        if name == 'cohens_d':
+            return (mean1 - mean2) / np.sqrt(((n1-1)*var1 + (n2-1)*var2) / (n1+n2-2))
+        if name == 'welch_t':
+            return (mean1 - mean2) / np.sqrt(var1 / n1 + var2 / n2)
+    raise ValueError(f"Unknown statistic: {name}")
+
+def _chunk_rows(n_units, max_elements):
+    return max(1, max_elements // max(n_units, 1))
+
+def _gather(units, index):
+    """Sum the unit statistics selected by each row of an index matrix"""
+    return [np.take(column, index).sum(axis=1) for column in units]
+
+def _bootstrap_block(units, statistic, n_resamples, seed, max_elements):
+    units1, units2 = units
+    rng = np.random.default_rng(seed)
+    m1, m2 = len(units1[0]), len(units2[0])
+    result = np.empty(n_resamples)
+    
+    step = _chunk_rows(m1 + m2, max_elements)
+    for start in range(0, n_resamples, step):
+        rows = min(step, n_resamples - start)
+        totals1 = _gather(units1, rng.integers(0, m1, size=(rows, m1)))
+        totals2 = _gather(units2, rng.integers(0, m2, size=(rows, m2)))
+        result[start:start + rows] = _statistic(statistic, *totals1, *totals2)
+    return result
+
+def _permutation_block(units, statistic, n_resamples, seed, max_elements):
+    units1, units2 = units
+    pooled = [np.concatenate([a, b]) for a, b in zip(units1, units2)]
+    grand = [column.sum() for column in pooled]
+    rng = np.random.default_rng(seed)
+    m1, m_total = len(units1[0]), len(pooled[0])
+    result = np.empty(n_resamples)
+    
+    step = _chunk_rows(m_total, max_elements)
+    base = np.arange(m_total)
+    for start in range(0, n_resamples, step):
+        rows = min(step, n_resamples - start)
+        # Each row is a random relabelling; the first m1 positions form group 1
+        index = rng.permuted(np.broadcast_to(base, (rows, m_total)), axis=1)[:, :m1]
+        totals1 = _gather(pooled, index)
+        totals2 = [g - t for g, t in zip(grand, totals1)]
+        result[start:start + rows] = _statistic(statistic, *totals1, *totals2)
+    return result
+
+BLOCK_FUNCTIONS = {'bootstrap': _bootstrap_block, 'permutation': _permutation_block}
+
+def _init_worker(units):
+    """Ship the unit statistics to each worker once instead of with every task"""
+    global _WORKER_UNITS
+    _WORKER_UNITS = units
+
+def _run_block(kind, statistic, n_resamples, seed, max_elements):
+    return BLOCK_FUNCTIONS[kind](_WORKER_UNITS, statistic, n_resamples, seed, max_elements)
+
+def run_resamples(kind, units, statistic, n_resamples=DEFAULT_RESAMPLES, seed=None,
+                  max_workers=None, block_size=DEFAULT_BLOCK_SIZE, max_elements=DEFAULT_MAX_ELEMENTS):
+    """
+    Resampled statistic values, computed in blocks of `block_size`.
+    Every block gets its own SeedSequence child, so results are reproducible for a
+    given seed regardless of how many workers run them. max_workers=1 stays in-process.
+    """
+    sizes = [block_size] * (n_resamples // block_size)
+    if n_resamples % block_size:
+        sizes.append(n_resamples % block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(sizes) == 1:
+        blocks = [BLOCK_FUNCTIONS[kind](units, statistic, size, s, max_elements) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(sizes)),
+                                 initializer=_init_worker, initargs=(units,)) as pool:
+            blocks = list(pool.map(
+                _run_block, [kind] * len(sizes), [statistic] * len(sizes), sizes, seeds,
+                [max_elements] * len(sizes)
+            ))
+    return np.concatenate(blocks)
+
+def _prepare(group1, group2, clusters1, clusters2):
+    """Unit statistics with values centred on the pooled mean (keeps sums of squares well-conditioned)"""
+    values1, values2 = np.asarray(group1, dtype=float), np.asarray(group2, dtype=float)
+    center = np.nanmean(np.concatenate([values1, values2]))
+    return unit_stats(values1 - center, clusters1), unit_stats(values2 - center, clusters2)
+
+def _observed(statistic, units):
+    units1, units2 = units
+    return float(_statistic(statistic, *[c.sum() for c in units1], *[c.sum() for c in units2]))
+
+def bootstrap_test(group1, group2, statistic='cohens_d', clusters1=None, clusters2=None,
+                   n_resamples=DEFAULT_RESAMPLES, confidence=0.95, seed=None, max_workers=None,
+                   block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Percentile bootstrap CI of group1 vs group2.
+    statistic: 'mean_diff', 'cohens_d' or 'welch_t'
+    clusters1/2: patient ids for stratified (cluster) resampling by patient
+    """
+    units = _prepare(group1, group2, clusters1, clusters2)
+    observed = _observed(statistic, units)
+    samples = run_resamples('bootstrap', units, statistic, n_resamples, seed, max_workers, block_size)
+    samples = samples[np.isfinite(samples)]
+    
+    alpha = 1 - confidence
+    lower, upper = (float(q) for q in np.percentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)]))
+    p_val = min(1.0, 2 * float(min(np.mean(samples <= 0), np.mean(samples >= 0))))
+    
+    return {
+        'statistic': statistic,
+        'estimate': observed,
+        'ci_lower': lower,
+        'ci_upper': upper,
+        'p_value': p_val,
+        'significant': not (lower <= 0 <= upper),
+        'difference': _observed('mean_diff', units),
+        'n_resamples': len(samples)
+    }
+
+def permutation_test(group1, group2, statistic='mean_diff', clusters1=None, clusters2=None,
+                     n_resamples=DEFAULT_RESAMPLES, seed=None, max_workers=None,
+                     block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Two-sided permutation p-value of group1 vs group2.
+    With clusters the group labels are shuffled between patients, not visits.
+    """
+    units = _prepare(group1, group2, clusters1, clusters2)
+    observed = _observed(statistic, units)
+    samples = run_resamples('permutation', units, statistic, n_resamples, seed, max_workers, block_size)
+    
+    exceed = np.count_nonzero(np.abs(samples) >= abs(observed) * (1 - 1e-9))  # tolerate float ties
+    p_val = (exceed + 1) / (len(samples) + 1)
+    
+    return {
+        'statistic': statistic,
+        'estimate': observed,
+        'p_value': p_val,
+        'significant': p_val < 0.05,
+        'difference': _observed('mean_diff', units),
+        'n_resamples': len(samples)
+    }
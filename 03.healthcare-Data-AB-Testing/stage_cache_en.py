@@ -0,0 +1,145 @@
+"""
+Analysis Stage Cache
+Declared analysis stages with content-addressed result caching and concurrent execution
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.hashing_en import file_sha256
+
+class Stage:
+    """
+    One unit of the analysis DAG.
+    
+    inputs: files whose content keys the cache
+    params: anything else the result depends on (must have a stable repr)
+    code: functions/classes/modules the result depends on (defaults to func); the
+          full source of each one's module versions the result, so private helpers
+          next to them are covered too
+    depends_on: upstream stage names; their results are passed to func in order
+    """
+    
+    def __init__(self, name, func, inputs=(), params=None, code=None, depends_on=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.code = list(code) if code is not None else [func]
+        self.depends_on = list(depends_on)
+
+def _source_hash(objects):
+    """Hash of the source of every module defining one of objects (each module once)"""
+    sources = {}
+    for obj in objects:
+        module = inspect.getmodule(obj)
+        try:
+            sources.setdefault(module.__name__, inspect.getsource(module))
+        except (AttributeError, OSError, TypeError):
+            sources.setdefault(repr(obj), repr(obj))
+    digest = hashlib.sha256()
+    for name in sorted(sources):
+        digest.update(name.encode('utf-8'))
+        digest.update(sources[name].encode('utf-8'))
+    return digest.hexdigest()
+
+class StageRunner:
+    """
+    Runs stages in dependency order on a thread pool. A stage is recomputed only
+    when the hash of its input files, params, code or upstream keys changed;
+    otherwise its pickled result is loaded from cache_dir.
+    """
+    
+    def __init__(self, cache_dir='.stage_cache', max_workers=None, use_cache=True):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.stages = {}
+        self.report = {}
+    
+    def add(self, name, func, inputs=(), params=None, code=None, depends_on=()):
+        self.stages[name] = Stage(name, func, inputs, params, code, depends_on)
+        return self
+    
+    def stage_key(self, stage, upstream_keys):
+        digest = hashlib.sha256(stage.name.encode('utf-8'))
+        for path in stage.inputs:
+            digest.update(f"{os.path.abspath(path)}:{file_sha256(path)}".encode('utf-8'))
+        digest.update(repr(sorted(stage.params.items())).encode('utf-8'))
+        digest.update(_source_hash(stage.code).encode('utf-8'))
+        for key in upstream_keys:
+            digest.update(key.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _cache_path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key[:16]}.pkl")
+    
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as file:
+                return True, pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return False, None
+    
+    def _store(self, path, result):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    
+    def _execute(self, stage, key, upstream):
+        """Load or compute one stage; returns (result, cached, seconds)"""
+        start = time.perf_counter()
+        path = self._cache_path(stage.name, key)
+        if self.use_cache:
+            found, result = self._load(path)
+            if found:
+                return result, True, time.perf_counter() - start
+        
+        result = stage.func(*upstream)
+        if self.use_cache:
+            self._store(path, result)
+        return result, False, time.perf_counter() - start
+    
+    def run(self, on_done=None):
+        """
+        Execute every stage; independent stages run concurrently.
+        on_done(name, cached, seconds) is called as each stage finishes.
+        Returns {stage name: result} in declaration order.
+        """
+        for stage in self.stages.values():
+            missing = [d for d in stage.depends_on if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+        
+        results, keys, running = {}, {}, {}
+        pending = dict(self.stages)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in results for d in s.depends_on)]
+                if not ready and not running:
+                    raise ValueError(f"Dependency cycle between stages {list(pending)}")
+                
+                for stage in ready:
+                    del pending[stage.name]
+                    keys[stage.name] = self.stage_key(stage, [keys[d] for d in stage.depends_on])
+                    upstream = [results[d] for d in stage.depends_on]
+                    running[pool.submit(self._execute, stage, keys[stage.name], upstream)] = stage.name
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name], cached, seconds = future.result()
+                    self.report[name] = {'cached': cached, 'seconds': seconds, 'key': keys[name]}
+                    if on_done:
+                        on_done(name, cached, seconds)
+        
+        return {name: results[name] for name in self.stages}
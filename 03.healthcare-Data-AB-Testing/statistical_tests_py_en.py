@@ -6,14 +6,23 @@ Core statistical functions for healthcare analysis
 import pandas as pd
 import numpy as np
 from scipy import stats
-from statsmodels.formula.api import mixedlm
-from statsmodels.stats.proportion import proportions_ztest
+from resampling_en import bootstrap_test, permutation_test
+from mixed_model_en import fit_random_intercept
+from outlier_sketch_en import OutlierFilter
 
-def mixed_effects_test(data, outcome, group_var, time_var, subject_id):
-    """Mixed-Effects Model analysis"""
-    formula = f'{outcome} ~ C({group_var}) * {time_var}'
-    model = mixedlm(formula, data, groups=data[subject_id])
-    results = model.fit()
+def mixed_effects_test(data, outcome, group_var, time_var, subject_id, engine='statsmodels', cache=None):
+    """
+    Mixed-Effects Model analysis.
+    engine='fast' fits the same random-intercept model from per-patient sufficient
+    statistics (mixed_model_en); cache=FitCache() reuses fits of identical data.
+    """
+    if engine == 'fast':
+        results = fit_random_intercept(data, outcome, group_var, time_var, subject_id, cache=cache)
+    else:
+        from statsmodels.formula.api import mixedlm  # ~2s import, only on this path
+        formula = f'{outcome} ~ C({group_var}) * {time_var}'
+        model = mixedlm(formula, data, groups=data[subject_id])
+        results = model.fit()
     
     # Extract key results
     group_params = [p for p in results.params.index if 'C(' in p and ')[T.' in p]
@@ -32,6 +41,7 @@ def mixed_effects_test(data, outcome, group_var, time_var, subject_id):
 
 def proportion_test(successes, totals):
     """Z-test between two proportions"""
+    from statsmodels.stats.proportion import proportions_ztest
     z_stat, p_val = proportions_ztest(successes, totals)
     
     rates = [s/t for s, t in zip(successes, totals)]
@@ -73,17 +83,14 @@ def welch_ttest(group1, group2):
         'difference': mean1 - mean2
     }
 
-def remove_outliers(data, column, method='iqr', multiplier=1.5):
-    """Remove outliers"""
-    if method == 'iqr':
-        Q1, Q3 = data[column].quantile([0.25, 0.75])
-        IQR = Q3 - Q1
-        lower, upper = Q1 - multiplier * IQR, Q3 + multiplier * IQR
-        return data[data[column].between(lower, upper)]
-    else:
-        # Z-score method
-        z_scores = np.abs(stats.zscore(data[column]))
-        return data[z_scores < multiplier]
+def remove_outliers(data, column, method='iqr', multiplier=1.5, by=None, mode='exact'):
+    """
+    Remove outliers (IQR or z-score).
+    by: optional group columns (e.g. ['region', 'group']) for per-group cutoffs;
+    mode='sketch' uses mergeable quantile sketches instead of the full column (outlier_sketch_en).
+    """
+    method = 'iqr' if method == 'iqr' else 'zscore'
+    return OutlierFilter(column, by=by, method=method, multiplier=multiplier, mode=mode).update(data).apply(data)
 
 def cohens_d(group1, group2):
     """Calculate Cohen's d effect size"""
@@ -91,6 +98,132 @@ def cohens_d(group1, group2):
     pooled_std = np.sqrt(((n1-1)*np.var(group1, ddof=1) + (n2-1)*np.var(group2, ddof=1)) / (n1+n2-2))
     return (np.mean(group1) - np.mean(group2)) / pooled_std
 
+# Batch variants - many comparisons in one NumPy pass from grouped sufficient statistics
+def grouped_stats(data, value_col, group_col, keys=None, groups=None):
+    """
+    Sufficient statistics (n, sum, mean, var, sum of squared deviations) per key and group.
+    Returns one row per key combination with columns suffixed 1/2 for groups[0]/groups[1].
+    NaN values are ignored; a group missing from a key gets n = 0.
+    """
+    keys = list(keys or [])
+    if groups is None:
+        groups = sorted(data[group_col].dropna().unique())
+    if len(groups) != 2:
+        raise ValueError(f"Exactly two groups are required, got {list(groups)}")
+    
+    subset = data[data[group_col].isin(groups)]
+    by = keys if keys else [np.zeros(len(subset), dtype=np.int8)]
+    agg = subset.groupby(by + [subset[group_col]], observed=True, sort=True)[value_col].agg(
+        ['count', 'sum', 'mean', 'var']
+    )
+    
+    # Columns (statistic, group); groups absent from the data still get columns
+    wide = agg.unstack(group_col).reindex(
+        columns=pd.MultiIndex.from_product([agg.columns, list(groups)])
+    )
+    if not keys:
+        wide = wide.reset_index(drop=True)
+    
+    result = pd.DataFrame(index=wide.index)
+    for suffix, group in zip(('1', '2'), groups):
+        result[f'n{suffix}'] = wide[('count', group)].fillna(0).astype(np.int64)
+        for column in ('sum', 'mean', 'var'):
+            result[f'{column}{suffix}'] = wide[(column, group)].astype(float)
+        result[f'ss{suffix}'] = result[f'var{suffix}'] * (result[f'n{suffix}'] - 1)
+    
+    return result
+
+def welch_ttest_from_stats(n1, mean1, var1, n2, mean2, var2):
+    """Vectorized Welch t-test; arguments are arrays with one entry per comparison"""
+    n1, mean1, var1, n2, mean2, var2 = (np.asarray(a, dtype=float) for a in (n1, mean1, var1, n2, mean2, var2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se1, se2 = var1 / n1, var2 / n2
+        t_stat = (mean1 - mean2) / np.sqrt(se1 + se2)
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    p_val = 2 * stats.t.sf(np.abs(t_stat), dof)
+    
+    return {'t_statistic': t_stat, 'df': dof, 'p_value': p_val, 'difference': mean1 - mean2}
+
+def cohens_d_from_stats(n1, mean1, var1, n2, mean2, var2):
+    """Vectorized Cohen's d with pooled standard deviation"""
+    n1, mean1, var1, n2, mean2, var2 = (np.asarray(a, dtype=float) for a in (n1, mean1, var1, n2, mean2, var2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled_std = np.sqrt(((n1-1)*var1 + (n2-1)*var2) / (n1+n2-2))
+        return (mean1 - mean2) / pooled_std
+
+def proportion_test_from_counts(successes1, totals1, successes2, totals2):
+    """Vectorized pooled two-proportion z-test (same statistic as proportions_ztest)"""
+    s1, n1, s2, n2 = (np.asarray(a, dtype=float) for a in (successes1, totals1, successes2, totals2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate1, rate2 = s1 / n1, s2 / n2
+        pooled = (s1 + s2) / (n1 + n2)
+        z_stat = (rate1 - rate2) / np.sqrt(pooled * (1 - pooled) * (1/n1 + 1/n2))
+    p_val = 2 * stats.norm.sf(np.abs(z_stat))
+    
+    return {'z_statistic': z_stat, 'p_value': p_val, 'rate1': rate1, 'rate2': rate2, 'difference': rate1 - rate2}
+
+def variance_test_from_stats(n1, var1, n2, var2):
+    """Vectorized F-test for equal variances (same convention as variance_test)"""
+    n1, var1, n2, var2 = (np.asarray(a, dtype=float) for a in (n1, var1, n2, var2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = np.where(var1 > var2, var1 / var2, var2 / var1)
+    df1, df2 = n1 - 1, n2 - 1
+    p_val = 2 * np.minimum(stats.f.cdf(f_stat, df1, df2), stats.f.sf(f_stat, df1, df2))
+    
+    return {'f_statistic': f_stat, 'p_value': p_val}
+
+def adjust_pvalues(p_values, method='fdr_bh'):
+    """Multiple-comparison correction (statsmodels multipletests); NaN p-values stay NaN"""
+    from statsmodels.stats.multitest import multipletests
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    finite = np.isfinite(p_values)
+    if finite.any():
+        adjusted[finite] = multipletests(p_values[finite], method=method)[1]
+    return adjusted
+
+def _tidy(grouped, results, correction, alpha):
+    """One row per comparison: keys, group statistics, test statistics and significance"""
+    frame = grouped.assign(**results)
+    p_col = 'p_value'
+    if correction:
+        frame['p_adjusted'] = adjust_pvalues(frame['p_value'], correction)
+        p_col = 'p_adjusted'
+    frame['significant'] = frame[p_col] < alpha
+    return frame.reset_index(drop=grouped.index.names == [None])
+
+def batch_welch_ttest(data, value_col, group_col, keys=None, groups=None, correction=None, alpha=0.05):
+    """
+    Welch t-test and Cohen's d of groups[0] vs groups[1] for every combination of `keys`.
+    correction: multipletests method (e.g. 'fdr_bh', 'bonferroni') or None
+    """
+    grouped = grouped_stats(data, value_col, group_col, keys, groups)
+    args = [grouped[c] for c in ('n1', 'mean1', 'var1', 'n2', 'mean2', 'var2')]
+    results = welch_ttest_from_stats(*args)
+    results['effect_size'] = cohens_d_from_stats(*args)
+    
+    columns = ['n1', 'n2', 'mean1', 'mean2']
+    return _tidy(grouped[columns], results, correction, alpha)
+
+def batch_proportion_test(data, value_col, group_col, keys=None, groups=None, correction=None, alpha=0.05):
+    """Two-proportion z-test per key combination; value_col holds 0/1 (or boolean) outcomes"""
+    grouped = grouped_stats(data.assign(**{value_col: data[value_col].astype(float)}), value_col, group_col, keys, groups)
+    grouped = grouped.rename(columns={'sum1': 'successes1', 'sum2': 'successes2'})
+    results = proportion_test_from_counts(
+        grouped['successes1'].fillna(0), grouped['n1'], grouped['successes2'].fillna(0), grouped['n2']
+    )
+    
+    columns = ['n1', 'n2', 'successes1', 'successes2']
+    return _tidy(grouped[columns], results, correction, alpha)
+
+def batch_variance_test(data, value_col, group_col, keys=None, groups=None, correction=None, alpha=0.05):
+    """F-test for equal variances per key combination"""
+    grouped = grouped_stats(data, value_col, group_col, keys, groups)
+    results = variance_test_from_stats(grouped['n1'], grouped['var1'], grouped['n2'], grouped['var2'])
+    
+    columns = ['n1', 'n2', 'var1', 'var2']
+    return _tidy(grouped[columns], results, correction, alpha)
+
 def quick_summary(test_results, test_name):
     """Summary of test results"""
     print(f"\n📊 {test_name} Results:")
@@ -104,14 +237,24 @@ def quick_summary(test_results, test_name):
     print(f"   Significance: {'Significant' if test_results['significant'] else 'Not Significant'}")
 
 # Convenience functions
-def analyze_groups(control, treatment, outcome_col, test_type='ttest'):
-    """Group comparison analysis"""
+def analyze_groups(control, treatment, outcome_col, test_type='ttest', cluster_col=None, **resample_kwargs):
+    """
+    Group comparison analysis.
+    test_type 'bootstrap' / 'permutation' use the resampling engine (resample_kwargs:
+    statistic, n_resamples, seed, max_workers); cluster_col resamples whole patients.
+    """
     
     if test_type == 'ttest':
         result = welch_ttest(treatment[outcome_col], control[outcome_col])
         result['effect_size'] = cohens_d(treatment[outcome_col], control[outcome_col])
     elif test_type == 'variance':
         result = variance_test(control[outcome_col], treatment[outcome_col])
+    elif test_type in ('bootstrap', 'permutation'):
+        test = bootstrap_test if test_type == 'bootstrap' else permutation_test
+        clusters = {}
+        if cluster_col:
+            clusters = {'clusters1': treatment[cluster_col], 'clusters2': control[cluster_col]}
+        result = test(treatment[outcome_col], control[outcome_col], **clusters, **resample_kwargs)
     
     return result
 
@@ -134,4 +277,5 @@ if __name__ == "__main__":
     print("- proportion_test(): Proportion test")
     print("- variance_test(): Variance test")
     print("- welch_ttest(): t-test")
-    print("- analyze_groups(): Group comparison")
\ No newline at end of file
+    print("- analyze_groups(): Group comparison")
+    print("- batch_welch_ttest() / batch_proportion_test() / batch_variance_test(): Many comparisons at once")
\ No newline at end of file
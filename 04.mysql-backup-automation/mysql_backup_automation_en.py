@@ -1,7 +1,17 @@
+import argparse
 import os
 import schedule
+import threading
 import time
-import mysql.connector
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from mysql.connector import pooling
+from sql_stream_en import SqlStatementReader, batch_inserts, is_sql_dump
+from restore_manifest_en import RestoreManifest
+from restore_metrics_en import OverrunWatchdog, RestoreMetrics
+
+# Session settings for the bulk-load fast path (restored after each file)
+FAST_LOAD_SETTINGS = ["SET SESSION unique_checks = 0", "SET SESSION foreign_key_checks = 0"]
+RESTORE_SETTINGS = ["SET SESSION unique_checks = 1", "SET SESSION foreign_key_checks = 1"]
 
 class BackupAutomation:
     def __init__(self):
@@ -18,58 +28,235 @@ class BackupAutomation:
             "busan": "C:/backup/busan",
             "incheon": "C:/backup/incheon"
         }
+        
+        # Restore settings
+        self.restore_config = {
+            "max_workers": 3,                # Databases restored concurrently
+            "pool_size": 1,                  # Connections kept open per database
+            "batch_inserts": True,           # Merge consecutive INSERTs into multi-row statements
+            "batch_bytes": 4 * 1024 * 1024,  # Max merged statement size (< max_allowed_packet)
+            "commit_rows": 0,                # Commit every N rows (0 = one commit per file)
+            "disable_checks": False,         # Skip unique/foreign-key checks during the load
+            "manifest_path": "restore_manifest.json",  # Applied-file history for incremental runs
+            "metrics_log": "restore_metrics.jsonl",    # JSON lines per file/database/run
+            "metrics_prom": "restore_metrics.prom",    # Prometheus textfile-collector output
+            "expected_run_seconds": 1800               # Alert when a run takes longer than this
+        }
+        
+        self.manifest = RestoreManifest(self.restore_config["manifest_path"])
+        self._pools = {}
+        self._pool_lock = threading.Lock()
+    
+    def get_connection(self, database):
+        """Get a connection from the database's pool (pool is created on first use)"""
+        with self._pool_lock:
+            if database not in self._pools:
+                self._pools[database] = pooling.MySQLConnectionPool(
+                    pool_name=f"restore_{database}",
+                    pool_size=self.restore_config["pool_size"],
+                    database=database,
+                    **self.db_config
+                )
+        return self._pools[database].get_connection()
     
-    def run_sql_file(self, database, file_path):
-        """Execute SQL file"""
-        conn = mysql.connector.connect(database=database, **self.db_config)
+    def run_sql_file(self, database, file_path, stats=None):
+        """
+        Execute SQL file and return its stats (statements, rows, bytes read,
+        connect vs execute time). Pass `stats` to keep partial numbers on failure.
+        """
+        options = self.restore_config
+        stats = {} if stats is None else stats
+        stats.update(statements=0, rows=0, bytes_read=0, connect_seconds=0.0, execute_seconds=0.0)
+        start = time.perf_counter()
+        
+        conn = self.get_connection(database)
+        stats['connect_seconds'] = time.perf_counter() - start
         cursor = conn.cursor()
+        reader = SqlStatementReader(file_path)
         
-        with open(file_path, 'r', encoding='utf-8') as file:
-            sql = file.read()
-            for command in sql.split(';'):
-                if command.strip():
-                    cursor.execute(command)
+        try:
+            if options["disable_checks"]:
+                for setting in FAST_LOAD_SETTINGS:
+                    cursor.execute(setting)
+            
+            # Statements are streamed one at a time (.sql or .sql.gz)
+            statements = iter(reader)
+            if options["batch_inserts"]:
+                statements = batch_inserts(statements, options["batch_bytes"])
+            
+            uncommitted_rows = 0
+            for command in statements:
+                execute_start = time.perf_counter()
+                cursor.execute(command)
+                stats['execute_seconds'] += time.perf_counter() - execute_start
+                stats['statements'] += 1
+                if cursor.rowcount > 0:
+                    stats['rows'] += cursor.rowcount
+                    uncommitted_rows += cursor.rowcount
+                
+                if options["commit_rows"] and uncommitted_rows >= options["commit_rows"]:
+                    conn.commit()
+                    uncommitted_rows = 0
+            
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass  # Connection already gone; keep the original error
+            raise
+        finally:
+            # Cleanup errors are only reported, so they never hide the restore error
+            try:
+                if options["disable_checks"]:
+                    for setting in RESTORE_SETTINGS:
+                        cursor.execute(setting)
+            except Exception as e:
+                print(f"⚠️ {database}: could not restore session settings: {e}")
+            finally:
+                # Always hand the connection back: each database pool holds a single connection
+                for release in (cursor.close, conn.close):
+                    try:
+                        release()
+                    except Exception as e:
+                        print(f"⚠️ {database}: {release.__qualname__} failed: {e}")
+                stats['bytes_read'] = reader.bytes_read
+                stats['seconds'] = time.perf_counter() - start
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
     
-    def process_backups(self):
-        """Process backup files"""
-        print(f"🔄 Backup started: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    def restore_database(self, db_name, path, file_names, metrics=None):
+        """Restore one database's files in the given (file-name) order"""
+        results = {}
         
+        for file_name in file_names:
+            file_path = os.path.join(path, file_name)
+            stats = {}
+            results[file_name] = stats
+            try:
+                self.run_sql_file(db_name, file_path, stats)
+                self.manifest.record(file_path, 'success', stats=stats)
+                print(f"✅ {db_name}/{file_name} "
+                      f"({stats['rows']:,} rows, {stats['rows_per_sec']:,.0f} rows/s)")
+            except Exception as e:
+                stats['error'] = str(e)
+                self.manifest.record(file_path, 'failed', error=str(e))
+                print(f"❌ {db_name}/{file_name}: {e}")
+            
+            if metrics is not None:
+                metrics.add_file(db_name, file_name, stats)
+        
+        return results
+    
+    def pending_files(self, force_full=False):
+        """
+        Files to restore per database: new/changed/failed ones, or everything with force_full.
+        Returns the plan and the number of unchanged files that were skipped.
+        """
+        plan, skipped = {}, 0
         for db_name, path in self.locations.items():
             if not os.path.exists(path):
                 continue
-                
-            sql_files = [f for f in os.listdir(path) if f.endswith('.sql')]
             
-            for file_name in sql_files:
-                try:
-                    self.run_sql_file(db_name, os.path.join(path, file_name))
-                    print(f"✅ {db_name}/{file_name}")
-                except Exception as e:
-                    print(f"❌ {db_name}/{file_name}: {e}")
-        
-        print(f"✅ Backup completed: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+            sql_files = sorted(f for f in os.listdir(path) if is_sql_dump(f))
+            plan[db_name] = [
+                f for f in sql_files
+                if force_full or self.manifest.is_pending(os.path.join(path, f))
+            ]
+            skipped += len(sql_files) - len(plan[db_name])
+        return plan, skipped
+    
+    def process_backups(self, force_full=False, dry_run=False):
+        """Process backup files (databases in parallel, files in order within a database)"""
+        plan, skipped = self.pending_files(force_full)
+        
+        if dry_run:
+            print(f"📋 Pending restore ({'full' if force_full else 'incremental'}):")
+            for db_name, file_names in plan.items():
+                for file_name in file_names:
+                    size_mb = os.path.getsize(os.path.join(self.locations[db_name], file_name)) / 1024 ** 2
+                    print(f"   → {db_name}/{file_name} ({size_mb:,.1f} MB)")
+            print(f"   Total: {sum(len(f) for f in plan.values())} files")
+            return plan
+        
+        print(f"🔄 Backup started: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        metrics = RestoreMetrics()
+        expected = self.restore_config["expected_run_seconds"]
+        
+        results = {}
+        with OverrunWatchdog(expected, lambda: self.alert_overrun(metrics)):
+            with ThreadPoolExecutor(max_workers=self.restore_config["max_workers"]) as executor:
+                futures = {
+                    executor.submit(
+                        self.restore_database, db_name, self.locations[db_name], file_names, metrics
+                    ): db_name
+                    for db_name, file_names in plan.items() if file_names
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+        
+        metrics.finish()
+        if expected and metrics.run_seconds > expected:
+            metrics.overrun = True
+        self.manifest.save()
+        self.export_metrics(metrics)
+        
+        print(f"✅ Backup completed: {time.strftime('%Y-%m-%d %H:%M:%S')} ({skipped} unchanged files skipped)")
+        return results
+    
+    def alert_overrun(self, metrics):
+        """Called by the watchdog when a run exceeds its expected duration"""
+        metrics.overrun = True
+        expected = self.restore_config["expected_run_seconds"]
+        print(f"⚠️ Backup run overrun: still running after {expected}s "
+              f"(started {time.strftime('%H:%M:%S', time.localtime(metrics.run_started))})")
+    
+    def export_metrics(self, metrics):
+        """Print per-database timing and write JSON/Prometheus metrics"""
+        for db_name, totals in sorted(metrics.databases().items()):
+            print(f"📊 {db_name}: {totals['files']} files, {totals['rows']:,} rows, "
+                  f"{totals['bytes_read'] / 1024 ** 2:,.1f} MB read, {totals['seconds']:.1f}s "
+                  f"(connect {totals['connect_seconds']:.1f}s / execute {totals['execute_seconds']:.1f}s)")
+        
+        if self.restore_config["metrics_log"]:
+            metrics.write_json_log(self.restore_config["metrics_log"])
+        if self.restore_config["metrics_prom"]:
+            metrics.write_prometheus(self.restore_config["metrics_prom"])
     
     def start_scheduler(self):
         """Auto-run daily at 9 AM"""
         schedule.every().day.at("09:00").do(self.process_backups)
-        print("📅 Scheduler started - Auto-run daily at 09:00")
+        print("📅 Scheduler started - Auto-run daily at 09:00 "
+              f"(overrun alert after {self.restore_config['expected_run_seconds']}s)")
         
         while True:
             schedule.run_pending()
             time.sleep(60)
 
-# Execute
-if __name__ == "__main__":
-    backup = BackupAutomation()
+def build_parser():
+    """Backup command line (`cli_en.py backup ...` forwards its arguments here)"""
+    parser = argparse.ArgumentParser(description="Restore branch MySQL backups")
+    commands = parser.add_subparsers(dest="command", required=True)
     
-    print("1️⃣ Run now")
-    print("2️⃣ Start scheduler")
+    run = commands.add_parser("run", help="restore pending backup files now")
+    run.add_argument("--dry-run", action="store_true", help="list pending files without restoring")
+    run.add_argument("--full", action="store_true", help="restore every file, ignoring the manifest")
+    
+    commands.add_parser("schedule", help="restore daily at 09:00 (blocks)")
+    return parser
+
+def main(argv=None):
+    """Non-interactive entry point: `run [--dry-run] [--full]` or `schedule`"""
+    args = build_parser().parse_args(argv)
+    backup = BackupAutomation()
     
-    if input("Choose: ") == "1":
-        backup.process_backups()
+    if args.command == "run":
+        backup.process_backups(force_full=args.full, dry_run=args.dry_run)
     else:
-        backup.start_scheduler()
\ No newline at end of file
+        backup.start_scheduler()
+
+# Execute
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Restore Manifest
+Remember which dump files were already applied so daily runs only restore the delta
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.hashing_en import file_sha256
+
+class RestoreManifest:
+    """
+    JSON manifest of applied files: path, size, mtime, content hash and outcome.
+    A file is pending when it is new, failed last time, or its content changed.
+    Size/mtime are compared first so unchanged files are never re-hashed.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hashes = {}
+        self.entries = self._load()
+    
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+    
+    def save(self):
+        """Atomic write so an interrupted run never leaves a corrupt manifest"""
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+    
+    @staticmethod
+    def _key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+    
+    def _content_hash(self, file_path, stat):
+        """Hash once per (path, size, mtime) within a run"""
+        cache_key = (self._key(file_path), stat.st_size, stat.st_mtime_ns)
+        if cache_key not in self._hashes:
+            self._hashes[cache_key] = file_sha256(file_path)
+        return self._hashes[cache_key]
+    
+    def is_pending(self, file_path):
+        """True when the file still has to be restored"""
+        entry = self.entries.get(self._key(file_path))
+        if entry is None or entry['status'] != 'success':
+            return True
+        
+        stat = os.stat(file_path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return False
+        
+        if self._content_hash(file_path, stat) != entry['sha256']:
+            return True
+        
+        # Touched/copied but identical - remember the new timestamp to skip hashing next time
+        with self._lock:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return False
+    
+    def record(self, file_path, status, error=None, stats=None):
+        """Store the outcome of applying a file and persist the manifest"""
+        stat = os.stat(file_path)
+        entry = {
+            'path': os.path.abspath(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': self._content_hash(file_path, stat),
+            'status': status,
+            'error': error,
+            'applied_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        if stats:
+            entry.update({k: v for k, v in stats.items() if k != 'error'})
+        
+        with self._lock:
+            self.entries[self._key(file_path)] = entry
+        self.save()
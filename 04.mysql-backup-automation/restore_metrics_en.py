@@ -0,0 +1,137 @@
+"""
+Restore Metrics
+Per-run, per-database and per-file restore metrics exported as JSON lines and a Prometheus textfile
+"""
+
+import json
+import math
+import numbers
+import os
+import threading
+import time
+
+FILE_FIELDS = ['seconds', 'statements', 'bytes_read', 'rows', 'errors', 'connect_seconds', 'execute_seconds']
+
+DATABASE_METRICS = {
+    'seconds': 'Summed file wall time of the last run',
+    'statements': 'Statements executed in the last run',
+    'bytes_read': 'Dump bytes read in the last run',
+    'rows': 'Rows affected in the last run',
+    'errors': 'Files that failed in the last run',
+    'files': 'Files restored in the last run',
+    'connect_seconds': 'Time spent acquiring connections in the last run',
+    'execute_seconds': 'Time spent executing statements in the last run',
+}
+
+class RestoreMetrics:
+    """Collects metrics for one process_backups run"""
+    
+    def __init__(self):
+        self.run_started = time.time()
+        self.run_seconds = None
+        self.overrun = False
+        self.files = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def add_file(self, database, file_name, stats):
+        """Record one file's stats (missing fields count as zero)"""
+        record = {'database': database, 'file': file_name}
+        record.update({field: stats.get(field, 0) for field in FILE_FIELDS})
+        record['errors'] = 1 if stats.get('error') else 0
+        record['error'] = stats.get('error')
+        with self._lock:
+            self.files.append(record)
+    
+    def finish(self):
+        self.run_seconds = time.perf_counter() - self._start
+    
+    def databases(self):
+        """Per-database totals"""
+        totals = {}
+        for record in self.files:
+            db = totals.setdefault(record['database'], dict.fromkeys(DATABASE_METRICS, 0))
+            db['files'] += 1
+            for field in FILE_FIELDS:
+                db[field] += record[field]
+        return totals
+    
+    def run_summary(self):
+        summary = dict.fromkeys(DATABASE_METRICS, 0)
+        for db in self.databases().values():
+            for field, value in db.items():
+                summary[field] += value
+        summary.update(
+            started_at=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.run_started)),
+            wall_seconds=self.run_seconds,
+            overrun=self.overrun
+        )
+        return summary
+    
+    def write_json_log(self, path):
+        """Append one JSON line per file, per database and for the run"""
+        run_id = time.strftime('%Y%m%dT%H%M%S', time.localtime(self.run_started))
+        with open(path, 'a', encoding='utf-8') as log:
+            for record in self.files:
+                log.write(json.dumps({'run_id': run_id, 'level': 'file', **record}) + '\n')
+            for database, totals in self.databases().items():
+                log.write(json.dumps({'run_id': run_id, 'level': 'database', 'database': database, **totals}) + '\n')
+            log.write(json.dumps({'run_id': run_id, 'level': 'run', **self.run_summary()}) + '\n')
+    
+    def write_prometheus(self, path):
+        """Write a node_exporter textfile-collector file (atomic rename)"""
+        lines = [
+            '# HELP backup_restore_run_seconds Wall time of the last restore run',
+            '# TYPE backup_restore_run_seconds gauge',
+            f'backup_restore_run_seconds {self.run_seconds or 0:.3f}',
+            '# HELP backup_restore_last_run_timestamp_seconds Start time of the last restore run',
+            '# TYPE backup_restore_last_run_timestamp_seconds gauge',
+            f'backup_restore_last_run_timestamp_seconds {self.run_started:.0f}',
+            '# HELP backup_restore_run_overrun 1 if the last run exceeded its expected duration',
+            '# TYPE backup_restore_run_overrun gauge',
+            f'backup_restore_run_overrun {int(self.overrun)}',
+        ]
+        
+        databases = self.databases()
+        for field, help_text in DATABASE_METRICS.items():
+            name = f'backup_restore_database_{field}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            for database, totals in sorted(databases.items()):
+                lines.append(f'{name}{{database="{_label_value(database)}"}} {_sample_value(totals[field])}')
+        
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+def _sample_value(value):
+    """Full-precision sample value: ints as digits (byte/row counts stay exact), floats via repr"""
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+def _label_value(value):
+    """Escape a label value for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class OverrunWatchdog:
+    """Fires an alert once if a run is still going after the expected duration"""
+    
+    def __init__(self, expected_seconds, on_overrun):
+        self._timer = threading.Timer(expected_seconds, on_overrun) if expected_seconds else None
+        if self._timer:
+            self._timer.daemon = True
+    
+    def __enter__(self):
+        if self._timer:
+            self._timer.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self._timer:
+            self._timer.cancel()
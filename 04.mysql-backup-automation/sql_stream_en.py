@@ -0,0 +1,275 @@
+"""
+Streaming SQL Dump Reader
+Yield statements one at a time from .sql / .sql.gz dumps with constant memory
+"""
+
+import codecs
+import gzip
+import re
+
+DEFAULT_BUFFER_SIZE = 1 << 20  # 1MB read buffer
+DEFAULT_BATCH_BYTES = 4 << 20  # Keep merged INSERTs below the server's max_allowed_packet
+QUOTES = ("'", '"', '`')
+
+_INSERT_PREFIX = re.compile(
+    r'(INSERT\s+(?:IGNORE\s+)?INTO\s+\S+(?:\s*\([^)]*\))?\s+VALUES)\s*(?=\()', re.IGNORECASE
+)
+_ON_DUPLICATE = re.compile(r'\bON\s+DUPLICATE\s+KEY\b', re.IGNORECASE)
+
+class SqlTokenizer:
+    """
+    Incremental statement splitter that understands the mysql client syntax:
+    quoted strings/identifiers (with backslash and doubled-quote escapes),
+    '-- ', '#' and '/* */' comments, executable '/*! */' comments and
+    DELIMITER changes used around triggers and procedures.
+    
+    Text can arrive in arbitrary pieces; only an incomplete token at the end
+    of a piece is carried over to the next one.
+    """
+    
+    def __init__(self, delimiter=';'):
+        self._pending = ''
+        self._parts = []
+        self._has_code = False
+        self._state = None  # None, a quote char, 'line_comment', 'block_comment', 'hint_comment'
+        self._at_line_start = True
+        self._set_delimiter(delimiter)
+    
+    def _set_delimiter(self, delimiter):
+        self.delimiter = delimiter
+        self._normal = re.compile(r"['\"`#\n]|--|/\*|" + re.escape(delimiter))
+        self._quote_end = {
+            "'": re.compile(r"['\\]"),
+            '"': re.compile(r'["\\]'),
+            '`': re.compile(r'`'),
+        }
+    
+    def _append(self, text, is_code=True):
+        if text:
+            self._parts.append(text)
+            if is_code and not self._has_code and not text.isspace():
+                self._has_code = True
+    
+    def _take_statement(self):
+        statement = ''.join(self._parts).strip() if self._has_code else None
+        self._parts = []
+        self._has_code = False
+        return statement
+    
+    def _delimiter_command(self, text, i, final):
+        """
+        Handle a 'DELIMITER xx' client command at the start of a line.
+        Returns the position after the command, -1 if more text is needed,
+        or None when the line is not a DELIMITER command.
+        """
+        p = i
+        while p < len(text) and text[p] in ' \t':
+            p += 1
+        
+        head = text[p:p + 10]
+        if len(head) < 10 and not final and 'delimiter '.startswith(head.lower()):
+            return -1
+        if not (head[:9].lower() == 'delimiter' and head[9:10] in (' ', '\t')):
+            return None
+        
+        end = text.find('\n', p)
+        if end < 0:
+            if not final:
+                return -1
+            end = len(text)
+        
+        new_delimiter = text[p + 10:end].split()
+        if new_delimiter:
+            self._set_delimiter(new_delimiter[0])
+        self._parts = []
+        return end
+    
+    def feed(self, text, final=False):
+        """Consume the next piece of text and yield every completed statement"""
+        text = self._pending + text
+        self._pending = ''
+        i, n = 0, len(text)
+        
+        while i < n:
+            state = self._state
+            
+            if state is None:
+                if self._at_line_start and not self._has_code:
+                    end = self._delimiter_command(text, i, final)
+                    if end == -1:
+                        self._pending = text[i:]
+                        break
+                    if end is not None:
+                        i = end
+                        continue
+                self._at_line_start = False
+                
+                m = self._normal.search(text, i)
+                if m is None:
+                    # Keep a short tail that may be the start of '--', '/*' or the delimiter
+                    cut = n if final else max(i, n - max(len(self.delimiter), 2))
+                    self._append(text[i:cut])
+                    self._pending = text[cut:]
+                    break
+                
+                self._append(text[i:m.start()])
+                token = m.group()
+                
+                if token == '\n':
+                    self._parts.append(token)
+                    self._at_line_start = True
+                    i = m.end()
+                elif token in QUOTES:
+                    self._append(token)
+                    self._state = token
+                    i = m.end()
+                elif token == '#':
+                    self._state = 'line_comment'
+                    i = m.end()
+                elif token in ('--', '/*'):
+                    if m.end() >= n and not final:
+                        self._pending = text[m.start():]
+                        break
+                    following = text[m.end():m.end() + 1]
+                    if token == '--':
+                        if following in ('', ' ', '\t', '\r', '\n'):
+                            self._state = 'line_comment'
+                            i = m.end()
+                        else:
+                            self._append('-')  # e.g. "1--1" is arithmetic, not a comment
+                            i = m.start() + 1
+                    elif following in ('!', '+'):
+                        # Executable comment (/*!40101 SET ... */) - part of the statement
+                        self._append(token)
+                        self._state = 'hint_comment'
+                        i = m.end()
+                    else:
+                        self._state = 'block_comment'
+                        i = m.end()
+                else:
+                    statement = self._take_statement()
+                    if statement:
+                        yield statement
+                    i = m.end()
+            
+            elif state in QUOTES:
+                m = self._quote_end[state].search(text, i)
+                if m is None:
+                    self._append(text[i:])
+                    break
+                
+                j = m.start()
+                if j + 1 >= n and not final:
+                    # Need the next character to tell an escape from the closing quote
+                    self._append(text[i:j])
+                    self._pending = text[j:]
+                    break
+                
+                if text[j] == '\\':
+                    self._append(text[i:j + 2])
+                    i = j + 2
+                elif text[j + 1:j + 2] == state:
+                    self._append(text[i:j + 2])  # doubled quote escape
+                    i = j + 2
+                else:
+                    self._append(text[i:j + 1])
+                    self._state = None
+                    i = j + 1
+            
+            elif state == 'line_comment':
+                end = text.find('\n', i)
+                if end < 0:
+                    break
+                self._state = None
+                i = end
+            
+            else:
+                end = text.find('*/', i)
+                if end < 0:
+                    tail = n - 1 if (text.endswith('*') and not final) else n
+                    if state == 'hint_comment':
+                        self._append(text[i:tail])
+                    self._pending = text[tail:]
+                    break
+                
+                if state == 'hint_comment':
+                    self._append(text[i:end + 2])
+                else:
+                    self._parts.append(' ')
+                self._state = None
+                i = end + 2
+        
+        if final:
+            statement = self._take_statement()
+            if statement:
+                yield statement
+
+class SqlStatementReader:
+    """Iterate over the statements of a .sql or .sql.gz dump read in fixed-size buffers"""
+    
+    def __init__(self, file_path, buffer_size=DEFAULT_BUFFER_SIZE, encoding='utf-8'):
+        self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.bytes_read = 0
+    
+    def _open(self):
+        if self.file_path.endswith('.gz'):
+            return gzip.open(self.file_path, 'rb')  # decompressed on the fly
+        return open(self.file_path, 'rb')
+    
+    def __iter__(self):
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        tokenizer = SqlTokenizer()
+        
+        with self._open() as file:
+            while True:
+                block = file.read(self.buffer_size)
+                self.bytes_read += len(block)
+                final = not block
+                yield from tokenizer.feed(decoder.decode(block, final=final), final=final)
+                if final:
+                    break
+
+def iter_sql_statements(file_path, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Yield the statements of a SQL dump one at a time"""
+    return iter(SqlStatementReader(file_path, buffer_size))
+
+def is_sql_dump(file_name):
+    """Plain or gzip-compressed SQL dump"""
+    return file_name.endswith(('.sql', '.sql.gz'))
+
+def _utf8_len(text):
+    """Size of text on the wire (max_allowed_packet counts bytes, not characters)"""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+def batch_inserts(statements, max_bytes=DEFAULT_BATCH_BYTES):
+    """
+    Merge consecutive 'INSERT INTO t (...) VALUES (...)' statements for the same
+    table into multi-row INSERTs of up to max_bytes, measured in UTF-8 bytes.
+    Anything else (DDL, SET, INSERT ... SELECT / ON DUPLICATE KEY UPDATE) is
+    passed through unchanged.
+    """
+    prefix, rows, size = None, [], 0
+    
+    for statement in statements:
+        m = _INSERT_PREFIX.match(statement)
+        if not m or not statement.endswith(')') or _ON_DUPLICATE.search(statement):
+            if rows:
+                yield f"{prefix} {','.join(rows)}"
+                prefix, rows, size = None, [], 0
+            yield statement
+            continue
+        
+        values = statement[m.end():]
+        values_bytes = _utf8_len(values)
+        if rows and (m.group(1) != prefix or _utf8_len(prefix) + size + values_bytes > max_bytes):
+            yield f"{prefix} {','.join(rows)}"
+            rows, size = [], 0
+        
+        prefix = m.group(1)
+        rows.append(values)
+        size += values_bytes + 1
+    
+    if rows:
+        yield f"{prefix} {','.join(rows)}"
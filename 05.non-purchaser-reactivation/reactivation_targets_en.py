@@ -0,0 +1,293 @@
+"""
+Reactivation Target Builder
+Vectorized, incremental inquiry-only customer list with a persistent purchaser phone index
+"""
+
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.schemas_en import CUSTOMERS
+
+KEY_COLUMNS = ['Region', 'Patientid']
+PHONE_COLUMN = 'PatientCellphone'
+PUSH_DELAY_DAYS = 14  # Purchase rate after an inquiry peaks at 2 weeks
+
+# Original row-by-row logic, kept as the reference for verify_against_legacy
+def is_valid_phone(phone):
+    return len(str(int(phone))) == 10 if isinstance(phone, (int, float)) else len(phone.strip()) == 10
+
+def legacy_phone_key(phone):
+    """Row-by-row normalize_phone: digits only, no leading zeros (None when empty)"""
+    if isinstance(phone, str):
+        digits = re.sub(r'\D', '', phone.strip())
+    elif pd.isna(phone):
+        return None
+    else:
+        digits = str(abs(int(phone)))
+    return digits.lstrip('0') or None
+
+def legacy_targets(df_all, df_no_chart, normalize_phones=False):
+    """
+    normalize_phones=True matches phones on legacy_phone_key like build_targets
+    does; the original logic compares the raw values (1012345678 != '1012345678').
+    """
+    no_chart_customers = set(zip(df_no_chart['Region'], df_no_chart['Patientid']))
+    purchased_customers = df_all[~df_all.apply(lambda row: (row['Region'], row['Patientid']) in no_chart_customers, axis=1)]
+    if normalize_phones:
+        purchased_phones = {legacy_phone_key(phone) for phone in purchased_customers['PatientCellphone']} - {None}
+        purchased = df_no_chart['PatientCellphone'].apply(lambda phone: legacy_phone_key(phone) in purchased_phones)
+        true_prospects = df_no_chart[~purchased.astype(bool)]
+    else:
+        true_prospects = df_no_chart[~df_no_chart['PatientCellphone'].isin(purchased_customers['PatientCellphone'])]
+    return true_prospects[true_prospects['PatientCellphone'].apply(is_valid_phone)]
+
+def _string_part(phones):
+    """Stripped strings where the value is a str, NaN elsewhere (numbers, NaN)"""
+    if phones.dtype == object or pd.api.types.is_string_dtype(phones):
+        return phones.str.strip()
+    return pd.Series(np.nan, index=phones.index, dtype=object)
+
+def valid_phone_mask(phones):
+    """
+    Vectorized is_valid_phone: strings must be 10 characters after strip, numbers
+    must have 10 characters as str(int(x)). Missing values are invalid.
+    """
+    phones = pd.Series(phones)
+    strings = _string_part(phones)
+    numbers = pd.to_numeric(phones.where(strings.isna()), errors='coerce')
+    truncated = np.trunc(numbers.to_numpy(dtype=float))
+    
+    # len(str(int(x))) == 10: ten digits, or a minus sign and nine digits
+    numeric_ok = ((truncated >= 1e9) & (truncated < 1e10)) | ((truncated <= -1e8) & (truncated > -1e9))
+    return pd.Series(np.where(strings.notna(), strings.str.len() == 10, numeric_ok), index=phones.index)
+
+def normalize_phone(phones):
+    """
+    Digits-only matching key without leading zeros, so '010-1234-5678',
+    '01012345678' and 1012345678 all map to '1012345678'. Empty -> NaN.
+    """
+    phones = pd.Series(phones)
+    strings = _string_part(phones)
+    numbers = pd.to_numeric(phones.where(strings.isna()), errors='coerce')
+    
+    digits = strings.str.replace(r'\D', '', regex=True).astype(object)
+    has_number = numbers.notna().to_numpy()
+    digits.loc[has_number] = numbers[has_number].abs().astype(np.int64).astype(str).to_numpy()
+    
+    normalized = digits.str.lstrip('0')
+    return normalized.where(normalized.str.len() > 0)
+
+def phone_hashes(normalized):
+    """Stable uint64 hash per normalized phone (callers drop NaN first)"""
+    return pd.util.hash_pandas_object(normalized.astype(str), index=False).to_numpy()
+
+def _canonical_keys(df, key_cols):
+    """Key columns as strings with integral floats written as ints (5.0 -> '5')"""
+    columns = {}
+    for col in key_cols:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.astype('Int64')
+        columns[col] = values.astype(str)
+    return pd.DataFrame(columns, index=df.index)
+
+def key_hashes(df, key_cols=KEY_COLUMNS):
+    """Stable uint64 hash of the multi-column customer key"""
+    return pd.util.hash_pandas_object(_canonical_keys(df, key_cols), index=False).to_numpy()
+
+def _isin_sorted(values, sorted_set):
+    """np.isin against a sorted unique uint64 array via binary search"""
+    if len(sorted_set) == 0:
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_set, values).clip(max=len(sorted_set) - 1)
+    return sorted_set[pos] == values
+
+def build_targets(df_all, df_no_chart, key_cols=KEY_COLUMNS, phone_col=PHONE_COLUMN):
+    """
+    One-shot vectorized version of the target logic:
+    purchasers = customers whose (Region, Patientid) is not an inquiry-only key;
+    targets = inquiry-only rows whose phone never appears among purchasers and is valid.
+    Phones are matched on their normalized form.
+    """
+    no_chart_keys = pd.MultiIndex.from_frame(df_no_chart[key_cols])
+    is_purchaser = ~pd.MultiIndex.from_frame(df_all[key_cols]).isin(no_chart_keys)
+    purchaser_phones = normalize_phone(df_all.loc[is_purchaser, phone_col]).dropna().unique()
+    
+    prospect_phones = normalize_phone(df_no_chart[phone_col])
+    true_prospects = ~prospect_phones.isin(purchaser_phones).to_numpy()
+    return df_no_chart[true_prospects & valid_phone_mask(df_no_chart[phone_col]).to_numpy()]
+
+def verify_against_legacy(df_all, df_no_chart):
+    """
+    True when build_targets selects the same rows as the row-by-row logic with
+    normalized phone matching (the intended difference from the original logic)
+    """
+    expected = legacy_targets(df_all, df_no_chart, normalize_phones=True)
+    return build_targets(df_all, df_no_chart).index.equals(expected.index)
+
+class ReactivationIndex:
+    """
+    Persistent state for daily incremental runs:
+    - sorted uint64 hashes of inquiry-only customer keys and of purchaser phones
+    - pending prospects (inquiry-only rows not yet matched to a purchase)
+    Each update only hashes the new rows; existing prospects are re-checked with
+    a binary search against the purchaser phone index.
+    
+    The index only grows: a purchaser phone is never retracted, so a purchase
+    row that is later corrected or deleted upstream keeps suppressing matching
+    prospects. After such corrections, call rebuild() with the full exports.
+    Everything is saved to one pickle that is atomically replaced, so a crash
+    mid-save leaves the previous day's state intact.
+    """
+    
+    def __init__(self, index_dir='.reactivation_index', key_cols=KEY_COLUMNS, phone_col=PHONE_COLUMN,
+                 date_col='ConsultTime', load=True):
+        self.index_dir = index_dir
+        self.key_cols = list(key_cols)
+        self.phone_col = phone_col
+        self.date_col = date_col
+        self._reset()
+        if load:
+            self._load()
+    
+    def _load(self):
+        """
+        Missing index -> start empty (first run). An index that exists but cannot be
+        read raises: starting empty would forget every purchaser and push ads to them.
+        """
+        path = self._path('index.pkl')
+        if not os.path.exists(path):
+            return
+        try:
+            state = pd.read_pickle(path)
+            no_chart_keys, purchaser_phones, prospects = (
+                state['no_chart_keys'], state['purchaser_phones'], state['prospects']
+            )
+        except Exception as e:
+            raise ValueError(f"Reactivation index {path} is unreadable ({e.__class__.__name__}: {e}); "
+                             f"rebuild it from the full exports (run_daily(..., rebuild=True) / --rebuild)") from e
+        self.no_chart_keys, self.purchaser_phones, self.prospects = no_chart_keys, purchaser_phones, prospects
+    
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+    
+    def _reset(self):
+        self.no_chart_keys = np.empty(0, dtype=np.uint64)
+        self.purchaser_phones = np.empty(0, dtype=np.uint64)
+        self.prospects = None
+    
+    def save(self):
+        """Write the arrays and prospects as one file (atomic rename), then a readable summary"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = self._path('index.pkl')
+        pd.to_pickle({
+            'no_chart_keys': self.no_chart_keys,
+            'purchaser_phones': self.purchaser_phones,
+            'prospects': self.prospects
+        }, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        
+        path = self._path('state.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'no_chart_keys': len(self.no_chart_keys),
+                'purchaser_phones': len(self.purchaser_phones),
+                'pending_prospects': 0 if self.prospects is None else int((~self.prospects['_pushed']).sum())
+            }, file, indent=2)
+        os.replace(path + '.tmp', path)
+    
+    def rebuild(self, df_all, df_no_chart):
+        """
+        Recompute the index from the full exports (drops purchaser phones whose
+        rows no longer exist). Prospects already pushed stay marked as pushed.
+        """
+        pushed = self.prospects is not None and self.prospects['_pushed'].any()
+        pushed_keys = np.unique(key_hashes(self.prospects[self.prospects['_pushed']], self.key_cols)) if pushed else None
+        
+        self._reset()
+        self.update(df_all, df_no_chart)
+        if pushed and self.prospects is not None and len(self.prospects):
+            self.prospects['_pushed'] = _isin_sorted(key_hashes(self.prospects, self.key_cols), pushed_keys)
+        return self
+    
+    def update(self, new_all=None, new_no_chart=None):
+        """Add the day's new customer rows (df_all increment) and new inquiry-only rows"""
+        if new_no_chart is not None and len(new_no_chart):
+            self.no_chart_keys = np.union1d(self.no_chart_keys, key_hashes(new_no_chart, self.key_cols))
+            
+            phones = normalize_phone(new_no_chart[self.phone_col])
+            rows = new_no_chart.assign(
+                _phone_key=phones,
+                _valid=valid_phone_mask(new_no_chart[self.phone_col]).to_numpy(),
+                _pushed=False
+            )
+            self.prospects = rows if self.prospects is None else pd.concat([self.prospects, rows], ignore_index=True)
+        
+        if new_all is not None and len(new_all):
+            is_purchaser = ~_isin_sorted(key_hashes(new_all, self.key_cols), self.no_chart_keys)
+            phones = normalize_phone(new_all.loc[is_purchaser, self.phone_col]).dropna()
+            self.purchaser_phones = np.union1d(self.purchaser_phones, phone_hashes(phones))
+        
+        # Prospects who purchased since their inquiry are no longer targets
+        if self.prospects is not None and len(self.prospects):
+            has_phone = self.prospects['_phone_key'].notna().to_numpy()
+            purchased = np.zeros(len(self.prospects), dtype=bool)
+            purchased[has_phone] = _isin_sorted(
+                phone_hashes(self.prospects.loc[has_phone, '_phone_key']), self.purchaser_phones
+            )
+            self.prospects = self.prospects[~purchased].reset_index(drop=True)
+        return self
+    
+    def due_targets(self, today=None, delay_days=PUSH_DELAY_DAYS, mark_pushed=True):
+        """
+        Valid prospects whose inquiry is at least `delay_days` old and who were not
+        pushed yet. With mark_pushed the returned rows are not returned again.
+        """
+        if self.prospects is None or not len(self.prospects):
+            return pd.DataFrame()
+        
+        today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+        inquiry = pd.to_datetime(self.prospects[self.date_col]).dt.normalize()
+        due = (
+            self.prospects['_valid'].to_numpy(dtype=bool)
+            & ~self.prospects['_pushed'].to_numpy(dtype=bool)
+            & (inquiry <= today - pd.Timedelta(days=delay_days)).to_numpy()
+        )
+        
+        targets = self.prospects[due]
+        if mark_pushed:
+            self.prospects.loc[due, '_pushed'] = True
+        return targets.drop(columns=['_phone_key', '_valid', '_pushed'])
+
+def run_daily(new_all, new_no_chart, index_dir='.reactivation_index', today=None, output_path=None,
+              rebuild=False):
+    """
+    Daily job: fold in the new rows, export the 2-week-due push list, persist the index.
+    With rebuild, new_all/new_no_chart are the full exports and replace the index.
+    """
+    new_all = None if new_all is None else CUSTOMERS.apply(new_all)
+    new_no_chart = None if new_no_chart is None else CUSTOMERS.apply(new_no_chart)
+    if rebuild:
+        try:
+            index = ReactivationIndex(index_dir)
+        except ValueError as e:
+            print(f"⚠️ {e.__cause__.__class__.__name__} reading the old index; rebuilding without its pushed marks")
+            index = ReactivationIndex(index_dir, load=False)
+        index.rebuild(new_all, new_no_chart)
+    else:
+        index = ReactivationIndex(index_dir).update(new_all, new_no_chart)
+    targets = index.due_targets(today)
+    index.save()
+    
+    if output_path:
+        targets.to_excel(output_path, index=False)
+    print(f"✅ Push list: {len(targets):,} customers "
+          f"({len(index.purchaser_phones):,} purchaser phones indexed)")
+    return targets
@@ -0,0 +1,413 @@
+"""
+Benchmark Suite
+Wall time and peak memory of every project's entry points on seeded synthetic data, with regression flags
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+for folder in ['01.healthcare-data-pipeline-0to1', '02.H1-KPI-Analysis-2023-2024', '03.healthcare-Data-AB-Testing',
+               '04.mysql-backup-automation', '05.non-purchaser-reactivation']:
+    sys.path.append(os.path.join(ROOT, folder))
+sys.path.append(ROOT)
+
+os.environ['MPLBACKEND'] = 'Agg'  # Entry points that plot must never open windows
+from synthetic_data_en import DATA_VERSION, SCALES, materialize
+
+# Benchmark settings
+BENCH_CONFIG = {
+    "scales": ['60k', '600k'],        # Default run; add '6M' for the production-scale pass
+    "seed": 42,
+    "repeats": {'60k': 3, '600k': 2, '6M': 1},  # Timed runs per case (median is reported)
+    "threshold": 0.20,                # Flag a regression when 20% slower / larger than the previous run
+    "min_seconds_delta": 0.05,        # Ignore timing changes smaller than this (noise)
+    "min_mb_delta": 5.0,              # Ignore memory changes smaller than this
+    "data_dir": os.path.join(BENCH_DIR, '.data'),
+    "results_dir": os.path.join(BENCH_DIR, 'results'),
+}
+
+class Case:
+    """
+    One benchmarked entry point.
+    
+    make(data) returns a zero-argument callable (setup such as copying inputs happens
+    in make and is not timed). Cases above max_rows are skipped; needs_excel cases
+    are skipped when the scale's workbooks exceed the worksheet row limit.
+    """
+    
+    def __init__(self, name, make, max_rows=None, needs_excel=False, available=None):
+        self.name = name
+        self.make = make
+        self.max_rows = max_rows
+        self.needs_excel = needs_excel
+        self.available = available  # callable returning None or a skip reason
+    
+    def skip_reason(self, data):
+        if self.max_rows and data['rows'] > self.max_rows:
+            return f"limited to {self.max_rows:,} rows"
+        if self.needs_excel and data['paths']['bmi_control'] is None:
+            return "workbooks exceed the Excel row limit"
+        if self.available:
+            return self.available()
+        return None
+
+# 02 KPI entry points
+def _kpi_flow(data):
+    from main_analysis_code_en import analyze_patient_flow
+    visits = data['visits']
+    return lambda: analyze_patient_flow(visits)
+
+def _kpi_demographics(data):
+    from main_analysis_code_en import analyze_demographics
+    visits = data['visits']
+    return lambda: analyze_demographics(visits)
+
+def _kpi_sales(data):
+    from main_analysis_code_en import analyze_sales_performance
+    sales = data['sales']
+    return lambda: analyze_sales_performance(sales)
+
+def _kpi_retention(data):
+    from main_analysis_code_en import analyze_retention
+    retention = data['retention']
+    return lambda: analyze_retention(retention)
+
+def _kpi_engine_run(data):
+    from kpi_engine_en import KPIEngine
+    visits, sales, retention = data['visits'], data['sales'], data['retention']
+    return lambda: KPIEngine(visits, sales, retention).run()
+
+# 03 A/B testing entry points
+def _analyzer(engine):
+    from data_analysis_py_en import HealthcareAnalyzer
+    analyzer = HealthcareAnalyzer(engine=engine)
+    analyzer.fit_cache = None  # Measure the fit itself, not a cache hit
+    return analyzer
+
+def _bmi_effect(engine):
+    def make(data):
+        analyzer, paths = _analyzer(engine), data['paths']
+        return lambda: analyzer.analyze_bmi_effect(paths['bmi_control'], paths['bmi_treatment'])
+    return make
+
+def _repurchase(data):
+    analyzer, paths = _analyzer('fast'), data['paths']
+    return lambda: analyzer.analyze_repurchase_rate(paths['repurchase'], windows=[25, 60, 120, 150, 200])
+
+def _referral(data):
+    analyzer, paths = _analyzer('fast'), data['paths']
+    return lambda: analyzer.analyze_referral_rate(paths['referral'], paths['incentives'])
+
+def _full_analysis(data):
+    analyzer, paths = _analyzer('fast'), data['paths']
+    paths = {
+        'bmi_control': paths['bmi_control'],
+        'bmi_treatment': paths['bmi_treatment'],
+        'repurchase': paths['repurchase'],
+        'referral_purchase': paths['referral'],
+        'referral_incentive': paths['incentives']
+    }
+    return lambda: analyzer.run_full_analysis(use_cache=False, paths=paths)
+
+def _mixed_effects(engine):
+    def make(data):
+        import pandas as pd
+        from statistical_tests_py_en import mixed_effects_test
+        analyzer = _analyzer(engine)
+        bmi = pd.concat([analyzer.preprocess_bmi_data(data['bmi_control'], 'control'),
+                         analyzer.preprocess_bmi_data(data['bmi_treatment'], 'treatment')])
+        return lambda: mixed_effects_test(bmi, 'bmi_reduction', 'group', 'days_since_start', 'patient_id', engine=engine)
+    return make
+
+def _batch_ttest(data):
+    from statistical_tests_py_en import batch_welch_ttest
+    visits = data['visits'].assign(year=data['visits']['Consulttime'] // 10**8)
+    return lambda: batch_welch_ttest(visits, 'Age', 'year', keys=['Region', 'patientSex'], correction='fdr_bh')
+
+def _bootstrap(data):
+    from resampling_en import bootstrap_test
+    control = data['bmi_control']['current_weight'].to_numpy()
+    treatment = data['bmi_treatment']['current_weight'].to_numpy()
+    return lambda: bootstrap_test(control, treatment, n_resamples=200, seed=0, max_workers=1)
+
+def _permutation(data):
+    from resampling_en import permutation_test
+    control = data['bmi_control']['current_weight'].to_numpy()
+    treatment = data['bmi_treatment']['current_weight'].to_numpy()
+    return lambda: permutation_test(control, treatment, n_resamples=200, seed=0, max_workers=1)
+
+# 01 pipeline entry points
+def _recovery(data):
+    from workflow_recovery_en import fast_workflow_recovery
+    clinic = data['clinic']
+    df, reference = clinic.copy(), clinic.copy()
+    return lambda: fast_workflow_recovery(df, reference, verbose=False)
+
+def _pipeline(data):
+    from pipeline_runner_en import run_pipeline
+    clinic = data['clinic']
+    sources = {region: {'data': part} for region, part in clinic.groupby('Region', sort=True)}
+    output_dir = os.path.join(BENCH_CONFIG["data_dir"], 'pipeline_parts')
+    return lambda: run_pipeline(sources, output_dir=output_dir)
+
+def _journey(data):
+    from package_journey_stage_en import package_journey_stage
+    df = data['clinic'].copy()
+    return lambda: package_journey_stage(df)
+
+# 04 backup entry points
+def _sql_parse(data):
+    from sql_stream_en import SqlStatementReader, batch_inserts
+    path = data['paths']['sql_dump']
+    
+    def parse():
+        statements = 0
+        for _ in batch_inserts(iter(SqlStatementReader(path))):
+            statements += 1
+        return statements
+    return parse
+
+def _mysql_settings():
+    return {
+        'host': os.environ.get('BENCH_MYSQL_HOST'),
+        'port': int(os.environ.get('BENCH_MYSQL_PORT', 3306)),
+        'user': os.environ.get('BENCH_MYSQL_USER', 'root'),
+        'password': os.environ.get('BENCH_MYSQL_PASSWORD', ''),
+        'database': os.environ.get('BENCH_MYSQL_DATABASE', 'bench'),
+    }
+
+def _mysql_unavailable():
+    settings = _mysql_settings()
+    if not settings['host']:
+        return "BENCH_MYSQL_HOST not set"
+    try:
+        import mysql.connector
+        mysql.connector.connect(connection_timeout=3, **settings).close()
+    except Exception as e:
+        return f"MySQL not reachable ({e.__class__.__name__})"
+    return None
+
+def _sql_restore(data):
+    from mysql_backup_automation_en import BackupAutomation
+    settings = _mysql_settings()
+    database = settings.pop('database')
+    backup = BackupAutomation()
+    backup.db_config = settings
+    path = data['paths']['sql_dump']
+    return lambda: backup.run_sql_file(database, path)
+
+# 05 reactivation entry points
+def _targets(data):
+    from reactivation_targets_en import build_targets
+    df_all, df_no_chart = data['reactivation_all'], data['reactivation_no_chart']
+    return lambda: build_targets(df_all, df_no_chart)
+
+def _reactivation_index(data):
+    from reactivation_targets_en import ReactivationIndex
+    df_all, df_no_chart = data['reactivation_all'], data['reactivation_no_chart']
+    index_dir = os.path.join(BENCH_CONFIG["data_dir"], 'unsaved_index')  # Never saved: every run starts empty
+    return lambda: ReactivationIndex(index_dir).update(df_all, df_no_chart).due_targets('2024-07-01')
+
+CASES = [
+    Case('kpi.analyze_patient_flow', _kpi_flow),
+    Case('kpi.analyze_demographics', _kpi_demographics),
+    Case('kpi.analyze_sales_performance', _kpi_sales),
+    Case('kpi.analyze_retention', _kpi_retention),
+    Case('kpi.KPIEngine.run', _kpi_engine_run),
+    Case('abtest.analyze_bmi_effect[statsmodels]', _bmi_effect('statsmodels'), max_rows=60_000, needs_excel=True),
+    Case('abtest.analyze_bmi_effect[fast]', _bmi_effect('fast'), needs_excel=True),
+    Case('abtest.analyze_repurchase_rate', _repurchase, needs_excel=True),
+    Case('abtest.analyze_referral_rate', _referral, needs_excel=True),
+    Case('abtest.HealthcareAnalyzer.run_full_analysis', _full_analysis, needs_excel=True),
+    Case('abtest.mixed_effects_test[statsmodels]', _mixed_effects('statsmodels'), max_rows=60_000),
+    Case('abtest.mixed_effects_test[fast]', _mixed_effects('fast')),
+    Case('abtest.batch_welch_ttest', _batch_ttest),
+    Case('abtest.bootstrap_test', _bootstrap, max_rows=600_000),
+    Case('abtest.permutation_test', _permutation, max_rows=600_000),
+    Case('pipeline.fast_workflow_recovery', _recovery),
+    Case('pipeline.run_pipeline', _pipeline),
+    Case('pipeline.package_journey_stage', _journey),
+    Case('backup.sql_parse_batch', _sql_parse),
+    Case('backup.run_sql_file', _sql_restore, available=_mysql_unavailable),
+    Case('reactivation.build_targets', _targets),
+    Case('reactivation.ReactivationIndex', _reactivation_index),
+]
+
+def _silenced(func):
+    """Run func with stdout discarded (entry points print progress lines)"""
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            return func()
+        finally:
+            sys.stdout = stdout
+
+def time_case(case, data, repeats):
+    """Median and min wall time over `repeats` runs after one untimed warm-up (imports, Excel cache)"""
+    _silenced(case.make(data))
+    timings = []
+    for _ in range(repeats):
+        func = case.make(data)
+        gc.collect()
+        start = time.perf_counter()
+        _silenced(func)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+def measure_memory(case, data):
+    """Peak traced Python allocation (MB) of one run, measured separately from timing"""
+    func = case.make(data)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _silenced(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 ** 2
+
+def run_suite(scales, seed, selected=None, memory=True):
+    records = []
+    for scale in scales:
+        print(f"🔄 Generating {scale} synthetic data (seed {seed})...")
+        data = materialize(scale, BENCH_CONFIG["data_dir"], seed)
+        repeats = BENCH_CONFIG["repeats"].get(scale, 1)
+        
+        for case in CASES:
+            if selected and not any(pattern in case.name for pattern in selected):
+                continue
+            record = {'case': case.name, 'scale': scale, 'rows': data['rows']}
+            reason = case.skip_reason(data)
+            if reason:
+                record.update(status='skipped', reason=reason)
+                print(f"⚠️ {scale:>5} {case.name:<42} skipped: {reason}")
+                records.append(record)
+                continue
+            
+            try:
+                record['seconds'], record['min_seconds'] = time_case(case, data, repeats)
+                record['repeats'] = repeats
+                if memory:
+                    record['peak_mb'] = measure_memory(case, data)
+                record['status'] = 'ok'
+                peak = f"{record['peak_mb']:9.1f} MB" if memory else ''
+                print(f"✅ {scale:>5} {case.name:<42} {record['seconds']:9.3f}s {peak}")
+            except Exception as e:
+                record.update(status='error', reason=f"{e.__class__.__name__}: {e}")
+                print(f"❌ {scale:>5} {case.name:<42} {record['reason']}")
+            records.append(record)
+    return records
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_previous(results_dir):
+    """Most recent saved run, or None"""
+    history_path = os.path.join(results_dir, 'history.jsonl')
+    try:
+        with open(history_path, encoding='utf-8') as file:
+            lines = [line for line in file if line.strip()]
+    except OSError:
+        return None
+    return json.loads(lines[-1]) if lines else None
+
+def find_regressions(records, previous, threshold):
+    """Cases that got slower or larger than the previous run (on the same synthetic data) by more than threshold"""
+    if not previous or previous.get('data_version', 1) != DATA_VERSION:
+        return []
+    before = {(r['case'], r['scale']): r for r in previous['results'] if r.get('status') == 'ok'}
+    regressions = []
+    
+    for record in records:
+        old = before.get((record['case'], record['scale']))
+        if record.get('status') != 'ok' or old is None:
+            continue
+        checks = [('seconds', BENCH_CONFIG["min_seconds_delta"]), ('peak_mb', BENCH_CONFIG["min_mb_delta"])]
+        for metric, min_delta in checks:
+            if metric not in record or not old.get(metric):
+                continue
+            change = record[metric] / old[metric] - 1
+            if change > threshold and record[metric] - old[metric] > min_delta:
+                regressions.append({'case': record['case'], 'scale': record['scale'], 'metric': metric,
+                                    'previous': old[metric], 'current': record[metric], 'change': change})
+    return regressions
+
+def save_run(records, regressions, results_dir, seed):
+    """Write results/<timestamp>.json and append the run to results/history.jsonl"""
+    os.makedirs(results_dir, exist_ok=True)
+    run = {
+        'run_id': time.strftime('%Y%m%d-%H%M%S'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'data_version': DATA_VERSION,
+        'results': records,
+        'regressions': regressions,
+    }
+    path = os.path.join(results_dir, f"{run['run_id']}.json")
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(run, file, indent=2)
+    with open(os.path.join(results_dir, 'history.jsonl'), 'a', encoding='utf-8') as file:
+        file.write(json.dumps(run) + '\n')
+    return path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every project entry point on synthetic data')
+    parser.add_argument('--scales', nargs='+', default=BENCH_CONFIG["scales"], choices=list(SCALES),
+                        help='data scales to run (default: %(default)s)')
+    parser.add_argument('--cases', nargs='+', help='only run cases whose name contains one of these strings')
+    parser.add_argument('--seed', type=int, default=BENCH_CONFIG["seed"])
+    parser.add_argument('--threshold', type=float, default=BENCH_CONFIG["threshold"],
+                        help='relative slowdown flagged as a regression (default: %(default)s)')
+    parser.add_argument('--results-dir', default=BENCH_CONFIG["results_dir"])
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--no-save', action='store_true', help='do not record this run in the history')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        for case in CASES:
+            print(case.name)
+        return 0
+    
+    previous = load_previous(args.results_dir)
+    records = run_suite(args.scales, args.seed, args.cases, memory=not args.no_memory)
+    regressions = find_regressions(records, previous, args.threshold)
+    
+    print("\n📊 Benchmark Summary")
+    print(f"   Cases: {sum(r['status'] == 'ok' for r in records)} ok, "
+          f"{sum(r['status'] == 'skipped' for r in records)} skipped, "
+          f"{sum(r['status'] == 'error' for r in records)} failed")
+    if previous:
+        print(f"   Compared with run {previous['run_id']} ({previous.get('git_commit')})")
+    for r in regressions:
+        print(f"⚠️ Regression: {r['case']} [{r['scale']}] {r['metric']} "
+              f"{r['previous']:.3f} → {r['current']:.3f} (+{r['change']:.0%})")
+    
+    if not args.no_save:
+        print(f"📋 Results saved: {save_run(records, regressions, args.results_dir, args.seed)}")
+    
+    failed = any(r['status'] == 'error' for r in records)
+    return 1 if failed or (regressions and args.fail_on_regression) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Synthetic Data Generator
+Seeded production-shaped data for every project: visits, sales, BMI, purchases, incentives, clinic records and SQL dumps
+"""
+
+import os
+import zlib
+import numpy as np
+import pandas as pd
+
+SCALES = {'60k': 60_000, '600k': 600_000, '6M': 6_000_000}
+DATA_VERSION = 2  # Bump when generated data changes so cached workbooks/dumps are regenerated
+EXCEL_MAX_ROWS = 1_048_575  # Worksheet limit without the header row
+REGIONS = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+LOCATIONS = {'loc_a': 'A', 'loc_b': 'B', 'loc_c': 'C', 'loc_d': 'D', 'loc_e': 'E', 'loc_f': 'F', 'loc_g': 'G'}
+MEDICINES = ['target_medication', 'Target Medication 10mg', 'vitamin_b', 'fat_burner', 'digestive_aid']
+MEMOS = ['1-1', '2-1', '3-1', '4-1', '1-2', 'consult only', '']
+
+def _rng(seed, name):
+    """
+    Independent stream per table so adding a table never changes the others
+    (CRC32 of the name: a sum of character codes collides for anagrams)
+    """
+    return np.random.default_rng([seed, zlib.crc32(name.encode('utf-8'))])
+
+def _dates(rng, n, start, days):
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 24 * 60, n), unit='min')
+
+def _h1_dates(rng, n):
+    """Dates in January-June of 2023 or 2024"""
+    year_start = np.where(rng.random(n) < 0.5, pd.Timestamp('2023-01-01').value, pd.Timestamp('2024-01-01').value)
+    offset = rng.integers(0, 181 * 24 * 60, n) * 60 * 10**9
+    return pd.to_datetime(year_start + offset)
+
+def visit_data(n, seed=42):
+    """KPI visit data: Consulttime (yyyymmddHHMM), patientchartno, Age, patientSex, Region"""
+    rng = _rng(seed, 'visits')
+    consult = _h1_dates(rng, n)
+    return pd.DataFrame({
+        'Consulttime': consult.strftime('%Y%m%d%H%M').astype(np.int64),
+        'patientchartno': rng.integers(100000, 100000 + max(n // 3, 1), n),
+        'Age': rng.integers(18, 70, n),
+        'patientSex': rng.choice(['F', 'M'], n, p=[0.7, 0.3]),
+        'Region': rng.choice(REGIONS, n)
+    })
+
+def sales_data(n, seed=42):
+    """KPI sales data: PayDate (yyyymmdd), paymentamt, patientchartno"""
+    rng = _rng(seed, 'sales')
+    return pd.DataFrame({
+        'PayDate': _h1_dates(rng, n).strftime('%Y%m%d').astype(np.int64),
+        'paymentamt': rng.lognormal(12.5, 0.4, n).round(-3),
+        'patientchartno': rng.integers(100000, 100000 + max(n // 3, 1), n),
+        'Region': rng.choice(REGIONS, n)
+    })
+
+def retention_data(n, seed=42):
+    rng = _rng(seed, 'retention')
+    return pd.DataFrame({
+        'Year': rng.choice([2023, 2024], n),
+        'Region': rng.choice(REGIONS, n),
+        'percentage': rng.normal(34, 5, n).clip(0, 100)
+    })
+
+def bmi_visits(n, group='control', seed=42):
+    """A/B BMI visits: about 4 visits per patient between day 0 and day 110"""
+    rng = _rng(seed, f'bmi_{group}')
+    n_patients = max(n // 4, 1)
+    patient = np.sort(rng.integers(0, n_patients, n))
+    height = rng.normal(163, 8, n_patients)
+    initial_weight = rng.uniform(25, 30, n_patients) * (height / 100) ** 2
+    start = _dates(rng, n_patients, '2023-01-01' if group == 'control' else '2024-01-01', 150)
+    days = rng.integers(0, 111, n)
+    loss = rng.normal(0.02 if group == 'control' else 0.025, 0.01, n) * days / 30
+    
+    return pd.DataFrame({
+        'patient_id': patient + (0 if group == 'control' else 10**7),
+        'visit_date': start[patient] + pd.to_timedelta(days, unit='D'),
+        'height': height[patient],
+        'initial_weight': initial_weight[patient],
+        'current_weight': initial_weight[patient] * (1 - loss)
+    })
+
+def purchase_pair(n, group='Group_1', seed=42):
+    """First purchases (one per patient) and second purchases of the ~45% who return"""
+    rng = _rng(seed, f'purchase_{group}')
+    first = pd.DataFrame({
+        'patient_id': np.arange(n),
+        'purchase_date': _dates(rng, n, '2024-01-01', 180)
+    })
+    returned = rng.random(n) < 0.45
+    second = pd.DataFrame({
+        'patient_id': first['patient_id'][returned].to_numpy(),
+        'purchase_date': first['purchase_date'][returned].to_numpy() + pd.to_timedelta(
+            rng.gamma(2.0, 60, returned.sum()).astype(int), unit='D'
+        )
+    })
+    return first, second
+
+def referral_purchases(n, month=1, seed=42):
+    rng = _rng(seed, f'referral_{month}')
+    return pd.DataFrame({
+        'region': rng.choice(REGIONS, n),
+        'patient_chart_no': rng.integers(0, max(n, 1), n),
+        'purchase_date': _dates(rng, n, f'2024-{month:02d}-01', 28)
+    })
+
+def incentives(n, seed=42):
+    rng = _rng(seed, 'incentives')
+    return pd.DataFrame({
+        'location': rng.choice(list(LOCATIONS), n),
+        'patient_chart_no': rng.integers(0, max(n, 1), n),
+        'incentive_date': _dates(rng, n, '2024-01-01', 330)
+    })
+
+def clinic_records(n, seed=42, missing_rate=0.1):
+    """Pipeline records with missing MedicineName for the recovery / journey stages"""
+    rng = _rng(seed, 'clinic')
+    consult = _dates(rng, n, '2022-06-01', 720)
+    paid = rng.random(n) < 0.8
+    medicine = pd.Series(rng.choice(MEDICINES, n), dtype=object)
+    medicine[rng.random(n) < missing_rate] = np.nan
+    return pd.DataFrame({
+        'Region': rng.choice(REGIONS, n),
+        'PatientID': rng.integers(0, max(n // 5, 1), n),
+        'ConsultTime': consult,
+        'PayDate': pd.Series(consult).where(paid) + pd.to_timedelta(rng.integers(0, 3, n), unit='D'),
+        'MedicineName': medicine,
+        'Memo': rng.choice(MEMOS, n),
+        'ProgressNote': rng.choice(['stable', 'weight down', 'side effect check', ''], n),
+        'DataUpdated': 0
+    })
+
+def reactivation_data(n, seed=42, no_chart_rate=0.2):
+    """All customers and the inquiry-only (no chart number) subset"""
+    rng = _rng(seed, 'reactivation')
+    phones = pd.Series(rng.integers(1_000_000_000, 1_000_000_000 + max(n // 2, 1), n), dtype=object)
+    formatted = rng.random(n) < 0.3
+    phones[formatted] = ['0' + str(p) for p in phones[formatted]]
+    phones[rng.random(n) < 0.03] = '123'
+    df_all = pd.DataFrame({
+        'Region': rng.choice(REGIONS, n),
+        'Patientid': np.arange(n),
+        'PatientCellphone': phones,
+        'ConsultTime': _dates(rng, n, '2024-01-01', 180)
+    })
+    return df_all, df_all[rng.random(n) < no_chart_rate]
+
+def write_sql_dump(path, n_rows, seed=42, table='patient_visit'):
+    """mysqldump-style file: header, CREATE TABLE and one INSERT per row"""
+    rng = _rng(seed, 'sql_dump')
+    chart = rng.integers(100000, 999999, n_rows)
+    amount = rng.integers(10, 900, n_rows) * 1000
+    notes = rng.choice(["stable", "it''s fine; next visit", "weight \\\\ check", "follow-up"], n_rows)
+    
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("-- MySQL dump (synthetic)\n/*!40101 SET NAMES utf8mb4 */;\n")
+        file.write(f"DROP TABLE IF EXISTS `{table}`;\n")
+        file.write(f"CREATE TABLE `{table}` (\n  `id` int NOT NULL,\n  `chart_no` int,\n"
+                   "  `amount` int,\n  `note` varchar(64),\n  PRIMARY KEY (`id`)\n);\n")
+        for start in range(0, n_rows, 10000):
+            stop = min(start + 10000, n_rows)
+            file.write(''.join(
+                f"INSERT INTO `{table}` VALUES ({i},{chart[i]},{amount[i]},'{notes[i]}');\n"
+                for i in range(start, stop)
+            ))
+    return path
+
+def _write_table(df, path):
+    if len(df) > EXCEL_MAX_ROWS:
+        return None  # Too large for a worksheet; frame-based entry points still run
+    if not os.path.exists(path):
+        df.to_excel(path, index=False)
+    return path
+
+def materialize(scale, data_dir, seed=42):
+    """
+    Generate every table for a scale ('60k', '600k', '6M' or a row count).
+    Frames are returned in memory; workbooks (only up to the Excel row limit) and
+    the SQL dump are written once per scale/seed and reused by later runs.
+    """
+    n = SCALES.get(scale, scale)
+    out_dir = os.path.join(data_dir, f"{scale}_seed{seed}_v{DATA_VERSION}")
+    os.makedirs(out_dir, exist_ok=True)
+    
+    data = {
+        'rows': n,
+        'visits': visit_data(n, seed),
+        'sales': sales_data(n, seed),
+        'retention': retention_data(max(n // 100, 100), seed),
+        'bmi_control': bmi_visits(n // 2, 'control', seed),
+        'bmi_treatment': bmi_visits(n // 2, 'treatment', seed),
+        'clinic': clinic_records(n, seed),
+        'incentives': incentives(n // 2, seed),
+    }
+    data['purchases'] = {group: purchase_pair(n // 4, group, seed) for group in ('Group_1', 'Group_2')}
+    data['referral'] = {month: referral_purchases(n // 4, month, seed) for month in (1, 2)}
+    data['reactivation_all'], data['reactivation_no_chart'] = reactivation_data(n, seed)
+    
+    # Workbooks for the path-based entry points (HealthcareAnalyzer)
+    paths = {
+        'bmi_control': _write_table(data['bmi_control'], os.path.join(out_dir, 'control_bmi.xlsx')),
+        'bmi_treatment': _write_table(data['bmi_treatment'], os.path.join(out_dir, 'treatment_bmi.xlsx')),
+        'incentives': _write_table(data['incentives'], os.path.join(out_dir, 'incentive_usage.xlsx')),
+        'repurchase': [],
+        'referral': []
+    }
+    for group, (first, second) in data['purchases'].items():
+        paths['repurchase'].append({
+            'first': _write_table(first, os.path.join(out_dir, f'{group}_first.xlsx')),
+            'second': _write_table(second, os.path.join(out_dir, f'{group}_second.xlsx')),
+            'group': group
+        })
+    for month, df in data['referral'].items():
+        paths['referral'].append({'path': _write_table(df, os.path.join(out_dir, f'purchase_{month:02d}.xlsx')),
+                                  'group': f'2024-{month:02d}'})
+    
+    dump_path = os.path.join(out_dir, 'patient_visit.sql')
+    if not os.path.exists(dump_path):
+        write_sql_dump(dump_path, n, seed)
+    paths['sql_dump'] = dump_path
+    
+    data['paths'] = paths
+    return data
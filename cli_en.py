@@ -0,0 +1,217 @@
+"""
+Portfolio Command Line
+Non-interactive entry point for the KPI, A/B test, backup and reactivation jobs with lazy heavy imports
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Headless everywhere: cron jobs and servers have no display
+os.environ['MPLBACKEND'] = 'Agg'
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PROJECTS = {
+    'kpi': '02.H1-KPI-Analysis-2023-2024',
+    'abtest': '03.healthcare-Data-AB-Testing',
+    'backup': '04.mysql-backup-automation',
+    'reactivation': '05.non-purchaser-reactivation',
+}
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'scipy', 'statsmodels', 'matplotlib', 'seaborn', 'mysql']
+
+def _use_project(command):
+    """Make a project folder importable (folder names are not package names)"""
+    for path in (ROOT, os.path.join(ROOT, PROJECTS[command])):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+# Each loader imports exactly what its command needs - nothing heavy at module load
+def load_kpi():
+    _use_project('kpi')
+    from kpi_engine_en import KPIEngine
+    return KPIEngine
+
+def load_abtest():
+    _use_project('abtest')
+    from data_analysis_py_en import HealthcareAnalyzer
+    return HealthcareAnalyzer
+
+def load_backup():
+    _use_project('backup')
+    import mysql_backup_automation_en
+    return mysql_backup_automation_en
+
+def load_reactivation():
+    _use_project('reactivation')
+    from common.excel_cache_en import read_excel_cached
+    from reactivation_targets_en import run_daily
+    return read_excel_cached, run_daily
+
+LOADERS = {
+    'kpi': load_kpi,
+    'abtest': load_abtest,
+    'backup': load_backup,
+    'reactivation': load_reactivation,
+}
+
+def run_kpi(args):
+    """Print the H1 KPI tables; --charts also renders every region x month comparison chart"""
+    KPIEngine = load_kpi()
+    engine = KPIEngine(args.visits, args.sales, args.retention)
+    filters = {k: v for k, v in (('Region', args.region), ('Month', args.month)) if v}
+    if filters:
+        engine = engine.segment(**filters)
+    results = engine.run()
+    
+    print("=== 2023 vs 2024 Healthcare KPI Summary ===")
+    if 'patient_flow' in results:
+        yearly = results['patient_flow'].groupby(level=0).mean()
+        print("\n📊 Average Monthly Patients:")
+        for year, value in yearly.items():
+            print(f"   {year}: {value:,.0f}")
+        age_dist, gender_dist = results['demographics']
+        print("\n👥 Age Groups:\n" + age_dist.to_string())
+        print("\n👥 Gender:\n" + gender_dist.to_string())
+    if 'sales_performance' in results:
+        print("\n💰 Sales:\n" + results['sales_performance'].to_string())
+    if 'retention' in results:
+        print("\n🔁 Retention (%):\n" + results['retention'].to_string())
+    if args.memory:
+        engine.memory.print()
+    if args.charts:
+        from chart_renderer_en import kpi_chart_specs, render_charts
+        render_charts(kpi_chart_specs(engine, fmt=args.chart_format), args.charts,
+                      max_workers=args.workers, use_cache=not args.no_cache)
+    return 0
+
+def run_abtest(args):
+    HealthcareAnalyzer = load_abtest()
+    paths = None
+    if args.paths:
+        with open(args.paths, encoding='utf-8') as file:
+            paths = json.load(file)
+    
+    analyzer = HealthcareAnalyzer(engine=args.engine)
+    analyzer.run_full_analysis(use_cache=not args.no_cache, max_workers=args.workers, paths=paths)
+    return 0
+
+def run_backup(args):
+    load_backup().main(args.backup_args)
+    return 0
+
+def run_reactivation(args):
+    read_excel_cached, run_daily = load_reactivation()
+    new_all = read_excel_cached(args.all) if args.all else None
+    new_no_chart = read_excel_cached(args.no_chart) if args.no_chart else None
+    run_daily(new_all, new_no_chart, index_dir=args.index_dir, today=args.today, output_path=args.output,
+              rebuild=args.rebuild)
+    return 0
+
+def _probe(command):
+    """Child process of `startup`: import one command's code path and report what got loaded"""
+    start = time.perf_counter()
+    LOADERS[command]()
+    print(json.dumps({
+        'import_seconds': time.perf_counter() - start,
+        'heavy': [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+    return 0
+
+def run_startup(args):
+    """Cold-start time per subcommand, each measured in fresh interpreters"""
+    def cold(argv):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable] + argv, capture_output=True, text=True, check=True).stdout
+        return time.perf_counter() - start, output
+    
+    commands = args.commands or list(LOADERS)
+    unknown = [c for c in commands if c not in LOADERS]
+    if unknown:
+        print(f"❌ Unknown commands {unknown} (choose from {', '.join(LOADERS)})")
+        return 2
+    
+    baseline = statistics.median(cold(['-c', 'pass'])[0] for _ in range(args.repeat))
+    print(f"📊 Cold start (median of {args.repeat}, interpreter alone {baseline:.2f}s)")
+    
+    report = {}
+    for command in commands:
+        runs = [cold([os.path.abspath(__file__), '_probe', command]) for _ in range(args.repeat)]
+        probe = json.loads(runs[-1][1].strip().splitlines()[-1])
+        report[command] = {
+            'seconds': statistics.median(r[0] for r in runs),
+            'import_seconds': statistics.median(json.loads(r[1].strip().splitlines()[-1])['import_seconds'] for r in runs),
+            'heavy_modules': probe['heavy'],
+        }
+        print(f"   {command:<13} {report[command]['seconds']:6.2f}s total  "
+              f"{report[command]['import_seconds']:6.2f}s imports  "
+              f"loaded: {', '.join(probe['heavy']) or '-'}")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'baseline_seconds': baseline, 'commands': report}, file, indent=2)
+        print(f"📋 Saved: {args.json}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Healthcare analysis portfolio jobs")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    kpi = commands.add_parser('kpi', help='print the 2023 vs 2024 KPI tables')
+    kpi.add_argument('--visits', required=True, help='visit data (.xlsx)')
+    kpi.add_argument('--sales', help='sales data (.xlsx)')
+    kpi.add_argument('--retention', help='retention data (.xlsx)')
+    kpi.add_argument('--region', help='only this Region')
+    kpi.add_argument('--month', help="only this month ('01'-'12')")
+    kpi.add_argument('--memory', action='store_true', help='print the memory footprint per dataset')
+    kpi.add_argument('--charts', metavar='DIR', help='render the 2023 vs 2024 comparison charts into DIR')
+    kpi.add_argument('--chart-format', choices=['png', 'svg'], default='png')
+    kpi.add_argument('--workers', type=int, help='chart rendering processes (default: one per CPU)')
+    kpi.add_argument('--no-cache', action='store_true', help='redraw charts even when their data is unchanged')
+    
+    abtest = commands.add_parser('abtest', help='run the split prescription A/B analysis')
+    abtest.add_argument('--engine', choices=['fast', 'statsmodels'], default='fast',
+                        help='mixed model engine (default: %(default)s; statsmodels adds ~2s of imports)')
+    abtest.add_argument('--paths', help='JSON file with the input paths (same keys as run_full_analysis)')
+    abtest.add_argument('--no-cache', action='store_true', help='recompute every stage')
+    abtest.add_argument('--workers', type=int, default=3)
+    
+    backup = commands.add_parser('backup', help='restore branch MySQL backups (run | schedule)')
+    backup.add_argument('backup_args', nargs=argparse.REMAINDER, help='run [--dry-run] [--full] | schedule')
+    
+    reactivation = commands.add_parser('reactivation', help='daily inquiry-only customer push list')
+    reactivation.add_argument('--all', help="new rows of the all-customers export (.xlsx)")
+    reactivation.add_argument('--no-chart', help='new inquiry-only rows (.xlsx)')
+    reactivation.add_argument('--index-dir', default='.reactivation_index')
+    reactivation.add_argument('--today', help='run date (default: today)')
+    reactivation.add_argument('--output', help='write the push list to this .xlsx')
+    reactivation.add_argument('--rebuild', action='store_true',
+                              help='--all/--no-chart are full exports: rebuild the index from them')
+    
+    startup = commands.add_parser('startup', help='measure cold-start time per subcommand')
+    startup.add_argument('commands', nargs='*', metavar='COMMAND', help=f"subset of {', '.join(LOADERS)} (default: all)")
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.add_argument('--json', help='also write the timings to this file')
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['_probe']:  # Internal: child process spawned by `startup`
+        return _probe(argv[1])
+    
+    args = build_parser().parse_args(argv)
+    if args.command == 'kpi':
+        return run_kpi(args)
+    if args.command == 'abtest':
+        return run_abtest(args)
+    if args.command == 'backup':
+        return run_backup(args)
+    if args.command == 'reactivation':
+        return run_reactivation(args)
+    return run_startup(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+Shared Utilities
+Helpers used across the portfolio analysis projects
+"""
@@ -0,0 +1,124 @@
+"""
+Columnar Excel Cache
+Parse each Excel workbook once and reuse a typed Arrow copy on later runs
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow is optional - fall back to plain read_excel
+    pa = None
+
+from common.hashing_en import file_sha256
+
+CACHE_DIR_NAME = '.excel_cache'
+
+def _cache_paths(file_path, cache_dir, read_kwargs):
+    """Arrow file and metadata sidecar for one workbook/sheet combination"""
+    source = os.path.abspath(file_path)
+    key_text = source + json.dumps(read_kwargs, sort_keys=True, default=str)
+    key = hashlib.sha1(key_text.encode('utf-8')).hexdigest()[:16]
+    
+    cache_dir = cache_dir or os.path.join(os.path.dirname(source), CACHE_DIR_NAME)
+    base = os.path.join(cache_dir, f"{os.path.basename(source)}.{key}")
+    return base + '.arrow', base + '.json'
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, meta_path)
+
+def _is_fresh(file_path, arrow_path, meta_path):
+    """
+    Check the cache against path, mtime/size and - if those moved - content hash.
+    Returns (fresh, content_hash); the hash is only set when it had to be computed.
+    """
+    meta = _load_meta(meta_path)
+    if meta is None or not os.path.exists(arrow_path):
+        return False, None
+    
+    stat = os.stat(file_path)
+    if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        return True, None
+    
+    # File was touched or copied: only rebuild when the content really changed
+    content_hash = file_sha256(file_path)
+    if content_hash != meta['sha256']:
+        return False, content_hash
+    
+    meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    _write_meta(meta_path, meta)
+    return True, None
+
+def _read_arrow(arrow_path):
+    """Memory-map the cached Arrow file (numeric buffers are not copied)"""
+    with pa.memory_map(arrow_path, 'r') as source:
+        table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+def _write_arrow(df, arrow_path):
+    """Write an uncompressed Arrow IPC file so it can be memory-mapped"""
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    tmp_path = arrow_path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, arrow_path)
+
+def read_excel_cached(file_path, cache_dir=None, **read_kwargs):
+    """
+    Drop-in replacement for pd.read_excel backed by a columnar cache.
+    
+    The first call parses the workbook with openpyxl and stores the result as
+    an Arrow file keyed by path and sheet options. Later calls memory-map that
+    file instead of parsing Excel again. The cache is invalidated automatically
+    when the workbook's content hash changes (mtime/size are checked first so
+    an unchanged file is never re-hashed).
+    """
+    if pa is None:
+        return pd.read_excel(file_path, **read_kwargs)
+    
+    arrow_path, meta_path = _cache_paths(file_path, cache_dir, read_kwargs)
+    fresh, content_hash = _is_fresh(file_path, arrow_path, meta_path)
+    if fresh:
+        return _read_arrow(arrow_path)
+    
+    df = pd.read_excel(file_path, **read_kwargs)
+    content_hash = content_hash or file_sha256(file_path)
+    stat = os.stat(file_path)
+    
+    try:
+        os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+        _write_arrow(df, arrow_path)
+    except (pa.ArrowException, TypeError, ValueError, OSError) as e:
+        # Mixed-type object columns cannot always be typed - serve uncached
+        print(f"⚠️ Excel cache skipped for {os.path.basename(file_path)}: {e}")
+        return df
+    
+    _write_meta(meta_path, {
+        'source': os.path.abspath(file_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': content_hash,
+    })
+    return df
+
+def clear_cache(file_path, cache_dir=None, **read_kwargs):
+    """Remove the cached copy of one workbook"""
+    for path in _cache_paths(file_path, cache_dir, read_kwargs):
+        if os.path.exists(path):
+            os.remove(path)
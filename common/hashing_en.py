@@ -0,0 +1,16 @@
+"""
+File Hashing
+Content hashes shared by the caches and the backup manifest (standard library only)
+"""
+
+import hashlib
+
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_sha256(file_path):
+    """Content hash of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
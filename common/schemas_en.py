@@ -0,0 +1,187 @@
+"""
+Dataset Schemas
+Declared column dtypes (categorical, narrow numeric) applied and validated on load, with memory reporting
+"""
+
+import numpy as np
+import pandas as pd
+
+# Column specs:
+#   'category'          low-cardinality labels stored as integer codes
+#   CategoricalDtype    fixed label set; values outside it are a validation error
+#   'integer'           smallest integer type that holds the values (stays float if NaN present)
+#   'id'                identifier: narrow integer when loaded as numbers, otherwise category
+#   'float'             float64 measure (kept wide: sums/means over float32 lose precision)
+#   'datetime'          parsed with pd.to_datetime
+#   'string'            free text, kept as is
+BMI_GROUPS = pd.CategoricalDtype(['control', 'treatment'])
+
+class SchemaError(ValueError):
+    """Raised when a frame does not match its declared schema"""
+
+class Schema:
+    """
+    Declared dtypes of one dataset. Columns not listed are passed through;
+    listed columns are optional unless named in `required`.
+    """
+    
+    def __init__(self, name, columns, required=()):
+        self.name = name
+        self.columns = dict(columns)
+        self.required = list(required)
+    
+    def validate(self, df):
+        """Raise SchemaError listing every missing column and unconvertible value"""
+        problems = [f"missing column '{col}'" for col in self.required if col not in df.columns]
+        
+        for col, spec in self.columns.items():
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if isinstance(spec, pd.CategoricalDtype):
+                unknown = set(values.dropna().unique()) - set(spec.categories)
+                if unknown:
+                    problems.append(f"'{col}' has values outside {list(spec.categories)}: {sorted(map(str, unknown))[:5]}")
+            elif spec in ('integer', 'float') and not pd.api.types.is_numeric_dtype(values):
+                bad = values.notna() & pd.to_numeric(values, errors='coerce').isna()
+                if bad.any():
+                    problems.append(f"'{col}' has {int(bad.sum())} non-numeric values, e.g. {values[bad].iloc[0]!r}")
+            elif spec == 'integer' and pd.api.types.is_float_dtype(values):
+                fractional = values.notna() & (values % 1 != 0)
+                if fractional.any():
+                    problems.append(f"'{col}' has {int(fractional.sum())} fractional values")
+        
+        if problems:
+            raise SchemaError(f"{self.name}: " + "; ".join(problems))
+        return True
+    
+    def apply(self, df, validate=True, report=None, stage=None):
+        """
+        Return df with the declared dtypes (the input frame is not modified).
+        report: optional MemoryReport that records the before/after footprint
+        under `stage` (defaults to the schema name).
+        """
+        if validate:
+            self.validate(df)
+        before = memory_mb(df) if report is not None else None
+        
+        converted = {col: _convert(df[col], spec) for col, spec in self.columns.items() if col in df.columns}
+        df = df.assign(**converted)
+        
+        if report is not None:
+            report.add(stage or self.name, len(df), before, memory_mb(df))
+        return df
+
+def _convert(values, spec):
+    if isinstance(spec, pd.CategoricalDtype):
+        return values.astype(spec)
+    if spec == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    if spec == 'integer':
+        return _downcast_integer(pd.to_numeric(values))
+    if spec == 'id':
+        if pd.api.types.is_numeric_dtype(values):
+            return _downcast_integer(values)
+        return values.astype('category')  # Text ids keep their exact spelling ('00123' != 123)
+    if spec == 'float':
+        return pd.to_numeric(values).astype(np.float64)
+    if spec == 'datetime':
+        return pd.to_datetime(values)
+    return values
+
+def _downcast_integer(numbers):
+    """Smallest integer dtype, unless NaN or fractions force the column to stay float"""
+    if pd.api.types.is_float_dtype(numbers) and (numbers.isna().any() or (numbers % 1 != 0).any()):
+        return numbers
+    return pd.to_numeric(numbers.astype(np.int64), downcast='integer')
+
+def memory_mb(df):
+    """Deep memory footprint of a frame (object strings included) in MB"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+class MemoryReport:
+    """Per-stage memory footprint before and after the schema was applied"""
+    
+    def __init__(self):
+        self.stages = []
+    
+    def add(self, stage, rows, before_mb, after_mb):
+        self.stages.append({'stage': stage, 'rows': rows, 'before_mb': before_mb, 'after_mb': after_mb})
+    
+    def to_frame(self):
+        frame = pd.DataFrame(self.stages, columns=['stage', 'rows', 'before_mb', 'after_mb'])
+        frame['saved_pct'] = (1 - frame['after_mb'] / frame['before_mb']) * 100
+        return frame
+    
+    def print(self):
+        print("📊 Memory by stage")
+        for stage in self.stages:
+            saved = (1 - stage['after_mb'] / stage['before_mb']) * 100 if stage['before_mb'] else 0.0
+            print(f"   {stage['stage']:<20} {stage['rows']:>10,} rows  "
+                  f"{stage['before_mb']:8.1f} MB → {stage['after_mb']:8.1f} MB (-{saved:.0f}%)")
+
+# 02 KPI analysis
+VISITS = Schema('visits', {
+    'Consulttime': 'integer',
+    'patientchartno': 'id',
+    'Age': 'integer',
+    'patientSex': 'category',
+    'Region': 'category',
+}, required=['Consulttime', 'patientchartno'])
+
+SALES = Schema('sales', {
+    'PayDate': 'integer',
+    'paymentamt': 'float',
+    'patientchartno': 'id',
+    'Region': 'category',
+}, required=['PayDate', 'paymentamt'])
+
+RETENTION = Schema('retention', {
+    'Year': 'integer',
+    'Region': 'category',
+    'percentage': 'float',
+}, required=['Year', 'percentage'])
+
+# 03 A/B testing
+BMI_VISITS = Schema('bmi_visits', {
+    'patient_id': 'id',
+    'visit_date': 'datetime',
+    'height': 'float',
+    'initial_weight': 'float',
+    'current_weight': 'float',
+    'group': BMI_GROUPS,
+}, required=['patient_id', 'visit_date', 'height', 'initial_weight', 'current_weight'])
+
+PURCHASES = Schema('purchases', {
+    'patient_id': 'id',
+    'purchase_date': 'datetime',
+    'region': 'category',
+    'patient_chart_no': 'id',
+    'group': 'category',
+}, required=['purchase_date'])
+
+INCENTIVES = Schema('incentives', {
+    'location': 'category',
+    'patient_chart_no': 'id',
+    'incentive_date': 'datetime',
+}, required=['location', 'patient_chart_no', 'incentive_date'])
+
+# 01 pipeline (MedicineName/Memo/ProgressNote are free text filled in by recovery)
+CLINIC_RECORDS = Schema('clinic_records', {
+    'Region': 'category',
+    'PatientID': 'id',
+    'ConsultTime': 'datetime',
+    'PayDate': 'datetime',
+    'MedicineName': 'string',
+    'Memo': 'string',
+    'ProgressNote': 'string',
+    'DataUpdated': 'integer',
+}, required=['PatientID', 'ConsultTime', 'MedicineName'])
+
+# 05 reactivation (phones stay as loaded: number vs text decides validity)
+CUSTOMERS = Schema('customers', {
+    'Region': 'category',
+    'Patientid': 'id',
+    'PatientCellphone': 'string',
+    'ConsultTime': 'datetime',
+}, required=['Region', 'Patientid', 'PatientCellphone'])
@@ -0,0 +1,78 @@
+"""
+Sorted Key Search
+Per-key binary search over (key, timestamp) arrays without Python loops
+"""
+
+import numpy as np
+import pandas as pd
+
+def factorize_keys(left, right, match_na=False):
+    """
+    Integer codes for key columns shared by two frames.
+    
+    Rows with a missing key get code -1 unless match_na=True, in which case
+    NaN keys are treated as a regular value (same as pd.merge does).
+    """
+    left = left.to_frame() if isinstance(left, pd.Series) else left
+    right = right.to_frame() if isinstance(right, pd.Series) else right
+    
+    keys = pd.concat([left, right], ignore_index=True)
+    codes = keys.groupby(list(keys.columns), dropna=not match_na, sort=False, observed=True).ngroup()
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64)
+    
+    return codes[:len(left)], codes[len(left):]
+
+def datetime_to_ns(values):
+    """datetime-like values as (int64 nanoseconds, not-NaT mask)"""
+    values = pd.to_datetime(pd.Series(values)).astype('datetime64[ns]')
+    return values.to_numpy().view(np.int64), values.notna().to_numpy()
+
+def sort_by_key(codes, times):
+    """Stable order by (code, time); ties keep their original position"""
+    return np.lexsort((np.arange(len(codes)), times, codes))
+
+def searchsorted_by_key(sorted_codes, sorted_times, query_codes, query_times, side='left'):
+    """
+    np.searchsorted over (code, time) pairs sorted lexicographically.
+    
+    Times are rank-compressed together with the query values, so codes and
+    ranks fit into one int64 composite key with exact ordering and ties.
+    """
+    all_times = np.concatenate([sorted_times, query_times])
+    uniq, inverse = np.unique(all_times, return_inverse=True)
+    stride = len(uniq) + 1
+    
+    sorted_key = sorted_codes.astype(np.int64) * stride + inverse[:len(sorted_times)]
+    query_key = query_codes.astype(np.int64) * stride + inverse[len(sorted_times):]
+    
+    return np.searchsorted(sorted_key, query_key, side=side)
+
+def interval_join_count(left, right, on, left_time, right_time, start, end):
+    """
+    For every left row, count right rows with the same key whose time falls in
+    [left_time + start, left_time + end) - same result as merging on `on` and
+    filtering the time difference, without materializing the cross product.
+    
+    start/end: pd.Timedelta offsets. Keys match like pd.merge (NaN equals NaN);
+    rows with a missing time never match.
+    """
+    on = [on] if isinstance(on, str) else list(on)
+    left_codes, right_codes = factorize_keys(left[on], right[on], match_na=True)
+    left_ns, left_valid = datetime_to_ns(left[left_time])
+    right_ns, right_valid = datetime_to_ns(right[right_time])
+    
+    # Right side as one sorted (key, time) array
+    right_codes, right_ns = right_codes[right_valid], right_ns[right_valid]
+    order = sort_by_key(right_codes, right_ns)
+    sorted_codes, sorted_ns = right_codes[order], right_ns[order]
+    
+    # Both window bounds located in one binary search
+    n = len(left_codes)
+    bounds = searchsorted_by_key(
+        sorted_codes, sorted_ns,
+        np.concatenate([left_codes, left_codes]),
+        np.concatenate([left_ns + pd.Timedelta(start).value, left_ns + pd.Timedelta(end).value])
+    )
+    counts = bounds[n:] - bounds[:n]
+    counts[~left_valid] = 0
+    return counts